@@ -4,6 +4,28 @@ import random
 import sys
 import json
 import os
+import struct
+import time
+import argparse
+import hashlib
+import mmap
+import copy
+from collections import namedtuple
+import queue
+import threading
+import array
+import shutil
+import subprocess
+import multiprocessing
+import tempfile
+import getpass
+import importlib.util
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Only needed to read trajectories back
 
 pygame.init()
 
@@ -12,7 +34,69 @@ SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 700
 FPS = 60
 SAVE_FILE = "ball_escape_save.json"
+JOURNAL_FILE = "ball_escape_journal.bin"
+JOURNAL_BATCH_SECONDS = 0.5  # Longest a progress event waits in memory before it is written
+JOURNAL_COMPACT_EVENTS = 256  # Events logged before the journal is folded into a new save
+TRAJECTORY_MAX_ENEMIES = 64  # Enemy slots per trajectory row; the row's count says if there were more
+TRAJECTORY_CAPACITY = 1 << 16  # Rows mapped up front; the file doubles when they run out
+GHOST_DIR = "ghosts"
+GHOST_LIMIT = 50  # Fastest runs kept per seeded course
+GHOST_SCALE = 2  # Ghost positions are stored in half pixels
+GHOST_BLOCK = 64  # Ticks per independently decodable block of a ghost path
+GHOST_ALPHA = 90
 BEST_SCORE_FILE = "best_score.json"
+REWIND_SECONDS = 10  # Length of the rewind buffer
+# Rewind slots are fixed-size; past these caps rewind is unavailable rather than lossy.
+# 32 enemies keeps capture and restore each under 50 us per tick.
+SNAPSHOT_MAX_ENEMIES = 32
+SNAPSHOT_MAX_POWER_UPS = 8
+SNAPSHOT_MAX_TIMERS = 16
+TIMER_WHEEL_SLOTS = 256
+POWER_UP_INTERVAL = 300  # Ticks between power-up spawns
+COLLISION_SKIN = 0.01  # Gap left between a blocked circle and the surface it hit
+# --bench timestep fails if a coarse swept step drifts further than this from the fine step (p95, px).
+# The runs are seeded (10.5 px at 4x, 26.6 px at 8x), so these leave about 15% headroom.
+TIMESTEP_MAX_P95_ERROR = {1: 0.5, 4: 12.0, 8: 30.0}
+SLIDE_ITERATIONS = 3
+# The world can be drawn at half the window size and upscaled. Fractional
+# factors such as 0.75 cost more in the upscale than they save in drawing.
+RENDER_SCALES = (1.0, 0.5)
+# Stress mode ramps each entity type until the p95 frame time breaks this budget
+FRAME_BUDGET_MS = 1000 / FPS
+STRESS_ENTITY_TYPES = ("enemies", "obstacles", "bg_elements")
+STRESS_PHASES = ("update", "capture", "world", "upscale", "hud", "flip")
+STRESS_MAX_COUNT = 20000
+# --golden renders a seeded scene per world and compares it with golden/<world>.png
+GOLDEN_SEED = 7
+GOLDEN_TICKS = 90  # Ticks simulated before the scene is drawn
+GOLDEN_TOLERANCE = 8  # Per-channel difference that still counts as the same pixel
+GOLDEN_MAX_DIFF = 0.001  # Fraction of pixels allowed past the tolerance
+# Draw layers, back to front, and the median time (ms) each should take per frame; --golden reports, never fails on, it
+RENDER_LAYERS = ("background", "obstacles", "actors", "players", "hud")
+LAYER_BUDGETS_MS = {"background": 2.0, "obstacles": 2.0, "actors": 1.0, "players": 0.5, "hud": 0.5}
+# Keys stored per tick in a recording, one bit each
+RECORDED_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN,
+                 pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s, pygame.K_BACKSPACE)
+# Local multiplayer: the first two players share the keyboard, the rest play on gamepads
+MAX_PLAYERS = 4
+ANY_CONTROLS = ((pygame.K_LEFT, pygame.K_a), (pygame.K_RIGHT, pygame.K_d),
+                (pygame.K_UP, pygame.K_w), (pygame.K_DOWN, pygame.K_s))  # Left, right, up, down
+ARROW_CONTROLS = ((pygame.K_LEFT,), (pygame.K_RIGHT,), (pygame.K_UP,), (pygame.K_DOWN,))
+PLAYER_CONTROLS = (((pygame.K_a,), (pygame.K_d,), (pygame.K_w,), (pygame.K_s,)), ARROW_CONTROLS)
+PLAYER_SPACING = 30  # Gap between players lined up on the spawn platform
+GAMEPAD_DEAD_ZONE = 0.3
+TEXT_CACHE_SIZE = 256  # Rendered HUD strings kept before the cache is reset
+OPEN_WORLD_SIZE = 20000  # Arena size in open-world mode
+CHUNK_SIZE = 1000
+SIMULATION_MARGIN = 400  # Entities further outside the viewport than this are frozen
+AI_LOD_INTERVAL = 4  # Ticks between full AI updates for enemies far from the player
+# Distance beyond an enemy's vision range where it drops to the slow rate; covers how far an
+# enraged Volcano enemy and a sped-up player can close in AI_LOD_INTERVAL ticks
+AI_LOD_MARGIN = 60
+VISION_CELL = 20  # Pixel size of a line-of-sight grid cell
+VISION_CACHE_SIZE = 1 << 16  # Cached line-of-sight answers kept before the cache is reset
+VISION_RAYS = 32  # Rays per enemy in the vision debug overlay
+PORTAL_RANGE = 3000  # Open-world portals spawn within this box around the spawn platform
 
 # Colors
 WHITE = (255, 255, 255)
@@ -37,59 +121,412 @@ BUTTON_HOVER = (100, 149, 237)
 BORDER_COLOR = (60, 0, 80)
 BORDER_THICKNESS = 15
 PLATFORM_COLOR = (100, 100, 100)  # Gray platform for spawning
+PLAYER_COLORS = (BLUE, GREEN, CYAN, PINK)
 
-# Darker background colors for better visibility
-WORLDS = {
-    "Surface": {
-        "bg_color": (135, 206, 235),  # Darker sky blue
-        "wall_color": DARK_GREEN,
-        "portal_color": BLUE,
-        "time_limit": 30,
-        "enemy_speed": 2.0,
-        "enemy_count": 2,
-        "bg_elements": ["tree", "cloud", "mountain"],
-        "obstacle_count": 5,
-        "portal_visible_time": 10,
-        "portal_hidden_time": 5
-    },
-    "Underground": {
-        "bg_color": (101, 67, 33),  # Kept as is
-        "wall_color": (101, 67, 33),
-        "portal_color": PURPLE,
-        "time_limit": 40,
-        "enemy_speed": 2.5,
-        "enemy_count": 3,
-        "bg_elements": ["crystal", "rock", "tunnel"],
-        "obstacle_count": 8,
-        "portal_visible_time": 8,
-        "portal_hidden_time": 6
-    },
-    "Cave": {
-        "bg_color": (50, 50, 50),  # Darker gray
-        "wall_color": GRAY,
-        "portal_color": YELLOW,
-        "time_limit": 50,
-        "enemy_speed": 3.0,
-        "enemy_count": 4,
-        "bg_elements": ["stalactite", "bat", "water_drop"],
-        "obstacle_count": 12,
-        "portal_visible_time": 7,
-        "portal_hidden_time": 7
-    },
-    "Volcano": {
-        "bg_color": (139, 0, 0),  # Darker red
-        "wall_color": ORANGE,
-        "portal_color": WHITE,
-        "time_limit": 60,
-        "enemy_speed": 3.5,
-        "enemy_count": 5,
-        "bg_elements": ["lava_bubble", "smoke", "rock"],
-        "obstacle_count": 15,
-        "portal_visible_time": 6,
-        "portal_hidden_time": 8
-    }
+GAME_STATES = ("PLAYING", "GAME_OVER", "LEVEL_COMPLETE")
+POWER_TYPES = ("speed", "shield", "freeze")
+TIMER_NAMES = ("power_expired", "portal_toggle", "spawn_power_up")
+
+WORLDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worlds")
+LEVEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".level_cache")
+LEVEL_CACHE_VERSION = 2
+ASSET_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset_cache")
+# Part of every asset key: bump it whenever Obstacle.render, the baking or the sound synthesis changes,
+# and older assets go unread
+ASSET_CACHE_VERSION = 1
+ASSET_CACHE_MAX_BYTES = 64 << 20  # Least recently used assets are evicted past this
+ASSET_COLORKEY = (255, 0, 255)  # Transparent in baked layers; no obstacle is drawn in it
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+COLLISION_CELL = 10  # Pixel size of a baked collision grid cell
+HOT_RELOAD_INTERVAL = FPS // 2  # Ticks between checks for edited world files
+IDLE_WAIT_MS = 250  # Longest the idle loop blocks waiting for an event
+# The mixer runs with a small buffer (about 12 ms at 44.1 kHz) so effects land on the frame that caused them
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 512
+AUDIO_VOICES = 8  # Channels shared by the effects; one more is reserved for the ambient loop
+AUDIO_MAX_LOAD_MS = 50  # --bench audio fails if the cached effects and a loop take longer to load
+AMBIENT_SECONDS = 2  # Length of a synthesized ambient loop
+AMBIENT_VOLUME = 0.25
+# Effects are synthesized once: priority, waveform and (start Hz, end Hz, seconds) segments.
+# When every voice is busy, a new effect takes over the oldest voice of equal or lower priority.
+SOUND_EFFECTS = {
+    "enrage": (1, "saw", [(110, 80, 0.4)]),
+    "portal": (2, "sine", [(300, 900, 0.25)]),
+    "power_up": (2, "square", [(523, 523, 0.07), (659, 659, 0.07), (784, 784, 0.1)]),
+    "life_lost": (3, "square", [(440, 110, 0.5)]),
+    "level_complete": (3, "sine", [(523, 523, 0.12), (659, 659, 0.12), (784, 784, 0.12), (1047, 1047, 0.3)])
+}
+PLUGIN_HOOKS = ("on_level_load", "on_tick", "on_collision", "on_draw")
+PLUGIN_BUDGET_MS = 2.0  # Frame time shared by the plugins' per-frame hooks, in equal parts
+PLUGIN_MAX_INTERVAL = 8  # A throttled hook still runs at least every this many frames
+PLUGIN_COST_SMOOTHING = 0.1  # Weight of the newest call in a hook's running cost
+
+OBSTACLE_TYPES = ("rectangle", "circle", "triangle", "brick", "rock")
+# Kinds by name, filled by the register_* functions: the built-ins after their classes, then any plugins
+BG_ELEMENTS = {}
+POWER_UPS = {}
+ENEMY_TYPES = {}
+
+# Optional per-world crowd steering weights, and their defaults
+CROWD_WEIGHTS = {"separation": 1.0, "alignment": 0.0}
+CROWD_RADIUS = 60  # Enemies closer than this push apart; also the neighbour grid cell size
+
+# Keys every world definition must have, with the kind of value they take
+WORLD_FIELDS = {
+    "bg_color": "color",
+    "wall_color": "color",
+    "portal_color": "color",
+    "time_limit": "number",
+    "enemy_speed": "number",
+    "enemy_count": "count",
+    "bg_elements": "elements",
+    "obstacle_count": "count",
+    "portal_visible_time": "number",
+    "portal_hidden_time": "number"
 }
 
+def validate_world(name, data):
+    config = {}
+    for key, kind in WORLD_FIELDS.items():
+        if key not in data:
+            raise ValueError(f"World '{name}' is missing '{key}'")
+        value = data[key]
+        if kind == "color":
+            if not (isinstance(value, list) and len(value) == 3
+                    and all(isinstance(c, int) and 0 <= c <= 255 for c in value)):
+                raise ValueError(f"World '{name}': '{key}' must be an RGB triple")
+            value = tuple(value)
+        elif kind == "elements":
+            if not isinstance(value, list) or any(e not in BG_ELEMENTS for e in value):
+                raise ValueError(f"World '{name}': '{key}' must list known background elements")
+        else:
+            number_types = int if kind == "count" else (int, float)
+            if isinstance(value, bool) or not isinstance(value, number_types) or value < 0:
+                raise ValueError(f"World '{name}': '{key}' must be a non-negative {kind}")
+        config[key] = value
+        
+    # Optional hand-authored layout replacing the random obstacles; it must fit on screen
+    layout = data.get("layout")
+    if layout is not None:
+        if not isinstance(layout, dict):
+            raise ValueError(f"World '{name}': 'layout' must be an object")
+        for obs in layout.get("obstacles", []):
+            if (not isinstance(obs, dict) or obs.get("type") not in OBSTACLE_TYPES
+                    or not all(isinstance(obs.get(k), int) for k in ("x", "y", "width", "height"))
+                    or obs["x"] < 0 or obs["y"] < 0 or obs["width"] <= 0 or obs["height"] <= 0
+                    or obs["x"] + obs["width"] > SCREEN_WIDTH or obs["y"] + obs["height"] > SCREEN_HEIGHT):
+                raise ValueError(f"World '{name}': invalid layout obstacle {obs}")
+        for spawn in layout.get("enemy_spawns", []):
+            if not (isinstance(spawn, list) and len(spawn) == 2 and all(isinstance(c, int) for c in spawn)
+                    and 0 <= spawn[0] < SCREEN_WIDTH and 0 <= spawn[1] < SCREEN_HEIGHT):
+                raise ValueError(f"World '{name}': invalid enemy spawn {spawn}")
+        config["layout"] = layout
+        
+    crowd = data.get("crowd", {})
+    if (not isinstance(crowd, dict) or any(k not in CROWD_WEIGHTS for k in crowd)
+            or any(isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0 for v in crowd.values())):
+        raise ValueError(f"World '{name}': 'crowd' must map {', '.join(CROWD_WEIGHTS)} to non-negative numbers")
+    config["crowd"] = dict(CROWD_WEIGHTS, **crowd)
+    
+    # Optional pitch (Hz) of the world's ambient drone; 0 is silence
+    ambient = data.get("ambient", 0)
+    if isinstance(ambient, bool) or not isinstance(ambient, (int, float)) or ambient < 0:
+        raise ValueError(f"World '{name}': 'ambient' must be a non-negative number")
+    config["ambient"] = ambient
+    return config
+
+class CompiledLevel:
+    """Baked obstacle geometry, collision grid and spawn table, memory-mapped from the cache"""
+    MAGIC = b"BELV"
+    HEADER = struct.Struct("<4sHHHHHH")
+    OBSTACLE = struct.Struct("<hhhhB")
+    SPAWN = struct.Struct("<hh")
+    
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.cols, self.rows, self.cell,
+         obstacle_count, spawn_count) = self.HEADER.unpack_from(self.data, 0)
+        if magic != self.MAGIC or version != LEVEL_CACHE_VERSION:
+            raise ValueError(f"Stale or corrupt level cache: {path}")
+        
+        self.obstacles_offset = self.HEADER.size
+        self.obstacle_count = obstacle_count
+        spawns_offset = self.obstacles_offset + obstacle_count * self.OBSTACLE.size
+        self.spawns = [self.SPAWN.unpack_from(self.data, spawns_offset + i * self.SPAWN.size)
+                       for i in range(spawn_count)]
+        grid_offset = spawns_offset + spawn_count * self.SPAWN.size
+        self.grid = memoryview(self.data)[grid_offset:grid_offset + self.cols * self.rows]
+        
+    def create_obstacles(self):
+        obstacles = []
+        for i in range(self.obstacle_count):
+            x, y, width, height, type_index = self.OBSTACLE.unpack_from(
+                self.data, self.obstacles_offset + i * self.OBSTACLE.size)
+            obstacles.append(Obstacle(x, y, width, height, OBSTACLE_TYPES[type_index]))
+        return obstacles
+        
+    def is_blocked(self, x, y):
+        col = int(x) // self.cell
+        row = int(y) // self.cell
+        if col < 0 or row < 0 or col >= self.cols or row >= self.rows:
+            return True
+        return self.grid[row * self.cols + col] != 0
+        
+    def is_clear(self, x, y, radius):
+        for cy in range(int(y - radius), int(y + radius) + self.cell, self.cell):
+            for cx in range(int(x - radius), int(x + radius) + self.cell, self.cell):
+                if self.is_blocked(min(cx, x + radius), min(cy, y + radius)):
+                    return False
+        return True
+        
+    @classmethod
+    def compile(cls, config, path):
+        layout = config["layout"]
+        obstacles = [Obstacle(o["x"], o["y"], o["width"], o["height"], o["type"])
+                     for o in layout.get("obstacles", [])]
+        rects = [obs.get_rect() for obs in obstacles]
+        # Rects pick the candidates, the exact shapes decide: cells and spawns in the empty
+        # corners around a circle or triangle stay free
+        shapes = shape_mask(obstacles, SCREEN_WIDTH, SCREEN_HEIGHT)
+        cols = SCREEN_WIDTH // COLLISION_CELL
+        rows = SCREEN_HEIGHT // COLLISION_CELL
+        
+        grid = bytearray(cols * rows)
+        cell_mask = pygame.mask.Mask((COLLISION_CELL, COLLISION_CELL), fill=True)
+        for row in range(rows):
+            for col in range(cols):
+                cell = pygame.Rect(col * COLLISION_CELL, row * COLLISION_CELL, COLLISION_CELL, COLLISION_CELL)
+                if cell.collidelist(rects) != -1 and shapes.overlap(cell_mask, cell.topleft):
+                    grid[row * cols + col] = 1
+                    
+        spawns = [tuple(spawn) for spawn in layout.get("enemy_spawns", [])]
+        if not spawns:
+            enemy_mask = circle_mask(20)
+            # Every fourth free cell that leaves room for an enemy
+            margin = BORDER_THICKNESS + 30
+            for row in range(0, rows, 4):
+                for col in range(0, cols, 4):
+                    x = col * COLLISION_CELL + COLLISION_CELL // 2
+                    y = row * COLLISION_CELL + COLLISION_CELL // 2
+                    if not (margin <= x <= SCREEN_WIDTH - margin and margin <= y <= SCREEN_HEIGHT - margin):
+                        continue
+                    if (not any(circle_rect_overlap(x, y, 20, r) for r in rects)
+                            or not shapes.overlap(enemy_mask, (x - 20, y - 20))):
+                        spawns.append((x, y))
+                        
+        data = bytearray(cls.HEADER.pack(cls.MAGIC, LEVEL_CACHE_VERSION, cols, rows, COLLISION_CELL,
+                                         len(obstacles), len(spawns)))
+        for obs in layout.get("obstacles", []):
+            data += cls.OBSTACLE.pack(obs["x"], obs["y"], obs["width"], obs["height"],
+                                      OBSTACLE_TYPES.index(obs["type"]))
+        for x, y in spawns:
+            data += cls.SPAWN.pack(x, y)
+        data += grid
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+class WorldError(ValueError):
+    """A world file that cannot be read or does not describe a valid world"""
+
+class WorldLibrary:
+    """World definitions from the worlds directory.
+    
+    Only index.json is read up front; each world file is parsed and validated
+    the first time it is used, so startup does not grow with the number of worlds.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "index.json"), "r") as f:
+            index = json.load(f)
+        self.files = {entry["name"]: entry["file"] for entry in index["worlds"]}
+        self.configs = {}
+        self.hashes = {}
+        self.levels = {}
+        self.mtimes = {}
+        
+    def __getitem__(self, name):
+        config = self.configs.get(name)
+        if config is None:
+            config = self.load(name)
+        return config
+        
+    def load(self, name):
+        path = os.path.join(self.directory, self.files[name])
+        try:
+            # Noted before parsing, so a broken file is reported once rather than on every poll
+            self.mtimes[name] = os.stat(path).st_mtime_ns
+            with open(path, "rb") as f:
+                raw = f.read()
+            config = validate_world(name, json.loads(raw))
+        except (OSError, ValueError) as e:
+            raise WorldError(f"{path}: {e}") from e
+        self.configs[name] = config
+        self.hashes[name] = hashlib.sha256(raw).hexdigest()
+        self.levels.pop(name, None)
+        return config
+        
+    def changed(self):
+        # Worlds already loaded whose files were edited since
+        changed = []
+        for name, mtime in self.mtimes.items():
+            try:
+                if os.stat(os.path.join(self.directory, self.files[name])).st_mtime_ns != mtime:
+                    changed.append(name)
+            except OSError:
+                pass
+        return changed
+        
+    def validate(self):
+        # Every world at once, for --check-worlds; playing only loads the worlds it reaches
+        for name in self.files:
+            self[name]
+            
+    def __iter__(self):
+        return iter(self.files)
+        
+    def __len__(self):
+        return len(self.files)
+        
+    def __contains__(self, name):
+        return name in self.files
+        
+    def keys(self):
+        return self.files.keys()
+        
+    def compiled_level(self, name):
+        # None for worlds without a hand-authored layout
+        config = self[name]
+        if "layout" not in config:
+            return None
+        level = self.levels.get(name)
+        if level is None:
+            key = f"{self.hashes[name][:32]}-v{LEVEL_CACHE_VERSION}-{SCREEN_WIDTH}x{SCREEN_HEIGHT}"
+            path = os.path.join(LEVEL_CACHE_DIR, key + ".bin")
+            if not os.path.exists(path):
+                CompiledLevel.compile(config, path)
+            level = CompiledLevel(path)
+            self.levels[name] = level
+        return level
+
+WORLDS = WorldLibrary(WORLDS_DIR)
+
+class AssetCache:
+    """Baked render assets and synthesized sounds on disk, addressed by a hash of everything that went into them.
+    
+    A file is a short header and raw RGB pixels or mixer samples, so a hit is one
+    read and a pygame.image.frombuffer or mixer.Sound, with no decoding. Hits refresh
+    the file's mtime and stores evict the least recently used files once the cap is passed.
+    """
+    MAGIC = b"BEAC"
+    HEADER = struct.Struct("<4sHHH")
+    SAMPLES_MAGIC = b"BEAS"
+    SAMPLES_HEADER = struct.Struct("<4sHI")
+    
+    def __init__(self, directory, max_bytes=ASSET_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        
+    @staticmethod
+    def key(kind, *parts):
+        content = json.dumps([ASSET_CACHE_VERSION, kind, SCREEN_WIDTH, SCREEN_HEIGHT, parts], sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()[:32]
+        
+    def path(self, key):
+        return os.path.join(self.directory, key + ".raw")
+        
+    def load(self, key):
+        entry = self.read(key, self.HEADER)
+        if entry is not None:
+            (magic, version, width, height), pixels = entry
+            if magic == self.MAGIC and version == ASSET_CACHE_VERSION and len(pixels) == width * height * 3:
+                return self.hit(key, pygame.image.frombuffer(pixels, (width, height), "RGB"))
+        return self.miss(key)
+        
+    def load_samples(self, key):
+        entry = self.read(key, self.SAMPLES_HEADER)
+        if entry is not None:
+            (magic, version, size), samples = entry
+            if magic == self.SAMPLES_MAGIC and version == ASSET_CACHE_VERSION and len(samples) == size:
+                return self.hit(key, samples)
+        return self.miss(key)
+        
+    def read(self, key, header):
+        # The header fields and payload of a file, or None if it is missing or shorter than a header
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < header.size:
+            return None
+        return header.unpack_from(data), memoryview(data)[header.size:]
+        
+    def hit(self, key, asset):
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+        self.hits += 1
+        return asset
+        
+    def miss(self, key):
+        # Missing, truncated or from another version of the drawing code
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+        self.misses += 1
+        return None
+        
+    def store(self, key, surface):
+        width, height = surface.get_size()
+        self.write(key, self.HEADER.pack(self.MAGIC, ASSET_CACHE_VERSION, width, height),
+                   pygame.image.tobytes(surface, "RGB"))
+        
+    def store_samples(self, key, samples):
+        self.write(key, self.SAMPLES_HEADER.pack(self.SAMPLES_MAGIC, ASSET_CACHE_VERSION, len(samples)), samples)
+        
+    def write(self, key, header, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # Per process, since export workers may bake the same layer at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self.evict()
+        
+    def evict(self):
+        # Export workers share the cache, so files may vanish under any of these calls
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".raw"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+ASSETS = AssetCache(ASSET_CACHE_DIR)
+
 # Utility: check overlap between rect and list of rects
 def rects_overlap(rect, rects, pad=0):
     test = rect.inflate(pad, pad)
@@ -119,11 +556,252 @@ def circles_overlap(x1, y1, r1, x2, y2, r2):
     min_distance = r1 + r2
     return distance_squared < (min_distance * min_distance)
 
+# Utility: pixel mask of a filled circle, its center at (radius, radius)
+def circle_mask(radius):
+    surface = pygame.Surface((radius * 2, radius * 2))
+    surface.set_colorkey(BLACK)
+    pygame.draw.circle(surface, WHITE, (radius, radius), radius)
+    return pygame.mask.from_surface(surface)
+
+# Utility: pixel mask of the exact obstacle shapes over a width x height area
+def shape_mask(obstacles, width, height):
+    surface = pygame.Surface((width, height))
+    surface.set_colorkey(BLACK)
+    for obs in obstacles:
+        obs.fill_shape(surface, WHITE)
+    return pygame.mask.from_surface(surface)
+
+# Utility: earliest t in [0, 1] at which a point moving by (dx, dy) comes within r of a center
+def ray_circle_hit(px, py, dx, dy, cx, cy, r):
+    fx = px - cx
+    fy = py - cy
+    b = fx*dx + fy*dy
+    if b >= 0:
+        return None  # Moving away
+    a = dx*dx + dy*dy
+    c = fx*fx + fy*fy - r*r
+    disc = b*b - a*c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    return t if 0 <= t <= 1 else None
+
+# Utility: earliest hit of a circle moving by (dx, dy) as (t, normal_x, normal_y), or None
+def sweep_circle(x, y, radius, dx, dy, obstacles):
+    # Broadphase on the swept bounding box
+    left = min(x, x + dx) - radius
+    right = max(x, x + dx) + radius
+    top = min(y, y + dy) - radius
+    bottom = max(y, y + dy) + radius
+    
+    best = None
+    for obs in obstacles:
+        if obs.x > right or obs.x + obs.width < left or obs.y > bottom or obs.y + obs.height < top:
+            continue
+        hit = obs.sweep(x, y, radius, dx, dy)
+        if hit is not None and (best is None or hit[0] < best[0]):
+            best = hit
+    return best
+
+# Utility: move a circle by (dx, dy), sliding along whatever it hits; returns (x, y, hit)
+def move_circle(x, y, radius, dx, dy, obstacles):
+    hit_any = False
+    for _ in range(SLIDE_ITERATIONS):
+        if dx == 0 and dy == 0:
+            break
+        hit = sweep_circle(x, y, radius, dx, dy, obstacles)
+        if hit is None:
+            return x + dx, y + dy, hit_any
+            
+        t, nx, ny = hit
+        hit_any = True
+        t = max(0.0, t - COLLISION_SKIN / math.hypot(dx, dy))
+        x += dx * t
+        y += dy * t
+        
+        # Slide: keep only the part of the remaining motion along the surface
+        dx *= 1 - t
+        dy *= 1 - t
+        into = dx*nx + dy*ny
+        if into < 0:
+            dx -= into * nx
+            dy -= into * ny
+    return x, y, hit_any
+
+class SpatialHash:
+    """Entity indices bucketed by grid cell, so neighbour queries only visit adjacent cells"""
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        
+    def rebuild(self, entities):
+        cells = self.cells = {}
+        cell = self.cell
+        for i, entity in enumerate(entities):
+            key = (int(entity.x // cell), int(entity.y // cell))
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [i]
+            else:
+                bucket.append(i)
+                
+    def near(self, x, y):
+        col = int(x // self.cell)
+        row = int(y // self.cell)
+        cells = self.cells
+        for c in (col - 1, col, col + 1):
+            for r in (row - 1, row, row + 1):
+                bucket = cells.get((c, r))
+                if bucket:
+                    yield from bucket
+
+def crowd_steering(i, enemies, candidates, separation, alignment):
+    # Push away from close neighbours and lean towards their average heading
+    enemy = enemies[i]
+    x, y = enemy.x, enemy.y
+    reach_sq = CROWD_RADIUS * CROWD_RADIUS
+    push_x = push_y = heading_x = heading_y = 0.0
+    neighbours = 0
+    for j in candidates:
+        other = enemies[j]
+        dx = x - other.x
+        dy = y - other.y
+        distance_sq = dx * dx + dy * dy
+        if j == i or distance_sq >= reach_sq:
+            continue
+        if distance_sq == 0:
+            # Exactly stacked: split the pair by list order so replays stay deterministic
+            push_x += 1 if i > j else -1
+        else:
+            distance = math.sqrt(distance_sq)
+            push = (CROWD_RADIUS - distance) / (CROWD_RADIUS * distance)
+            push_x += dx * push
+            push_y += dy * push
+        heading_x += math.cos(other.direction)
+        heading_y += math.sin(other.direction)
+        neighbours += 1
+    if not neighbours:
+        return 0.0, 0.0
+    return (separation * push_x + alignment * heading_x / neighbours,
+            separation * push_y + alignment * heading_y / neighbours)
+
+class VisibilityGrid:
+    """Cells covered by obstacles, with a cache of line-of-sight answers between pairs of cells"""
+    def __init__(self, obstacles, width, height):
+        self.obstacles = obstacles
+        self.count = len(obstacles)
+        self.cols = int(width) // VISION_CELL + 1
+        self.rows = int(height) // VISION_CELL + 1
+        self.blocked = bytearray(self.cols * self.rows)
+        self.cache = {}
+        half = VISION_CELL / 2
+        for obs in obstacles:
+            for row in range(max(0, obs.y // VISION_CELL), min(self.rows, (obs.y + obs.height) // VISION_CELL + 1)):
+                for col in range(max(0, obs.x // VISION_CELL), min(self.cols, (obs.x + obs.width) // VISION_CELL + 1)):
+                    if obs.overlaps_circle(col * VISION_CELL + half, row * VISION_CELL + half, half):
+                        self.blocked[row * self.cols + col] = 1
+                        
+    def cell(self, x, y):
+        return (max(0, min(self.cols - 1, int(x) // VISION_CELL)),
+                max(0, min(self.rows - 1, int(y) // VISION_CELL)))
+        
+    def line_of_sight(self, x0, y0, x1, y1):
+        start = self.cell(x0, y0)
+        end = self.cell(x1, y1)
+        # Sight is symmetric, so both directions share one entry
+        key = start + end if start <= end else end + start
+        clear = self.cache.get(key)
+        if clear is None:
+            if len(self.cache) >= VISION_CACHE_SIZE:
+                self.cache.clear()
+            clear = self.cache[key] = self.trace(*key)
+        return clear
+        
+    def trace(self, col, row, end_col, end_row):
+        # Bresenham between the two cells; the end cells hold the viewers themselves
+        d_col = abs(end_col - col)
+        d_row = -abs(end_row - row)
+        step_col = 1 if end_col > col else -1
+        step_row = 1 if end_row > row else -1
+        error = d_col + d_row
+        blocked = self.blocked
+        cols = self.cols
+        while (col, row) != (end_col, end_row):
+            double = 2 * error
+            if double >= d_row:
+                error += d_row
+                col += step_col
+            if double <= d_col:
+                error += d_col
+                row += step_row
+            if (col, row) != (end_col, end_row) and blocked[row * cols + col]:
+                return False
+        return True
+        
+    def ray(self, x, y, angle, reach):
+        # How far a sight line gets before an obstacle cell stops it
+        dx = math.cos(angle)
+        dy = math.sin(angle)
+        distance = VISION_CELL / 2
+        while distance < reach:
+            col = int(x + dx * distance) // VISION_CELL
+            row = int(y + dy * distance) // VISION_CELL
+            if not (0 <= col < self.cols and 0 <= row < self.rows) or self.blocked[row * self.cols + col]:
+                return distance
+            distance += VISION_CELL / 2
+        return reach
+
+class Camera:
+    """Viewport onto the arena; by default it covers the whole screen"""
+    def __init__(self, width, height, scale=1.0):
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+        # Pixels per world unit on the surface the world is drawn to
+        self.scale = scale
+        
+    def point(self, x, y):
+        return (int((x - self.x) * self.scale), int((y - self.y) * self.scale))
+        
+    def size(self, length):
+        return int(length * self.scale)
+        
+    def line(self, width):
+        # A width of 0 means "filled" to pygame, so outlines never vanish
+        return max(1, int(width * self.scale))
+        
+    def rect(self, x, y, width, height):
+        left, top = self.point(x, y)
+        return pygame.Rect(left, top, self.size(width), self.size(height))
+        
+    def follow(self, x, y, arena_width, arena_height):
+        self.x = int(max(0, min(arena_width - self.width, x - self.width // 2)))
+        self.y = int(max(0, min(arena_height - self.height, y - self.height // 2)))
+        
+    def sees(self, x, y, margin):
+        return (self.x - margin < x < self.x + self.width + margin
+                and self.y - margin < y < self.y + self.height + margin)
+        
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+SCREEN_CAMERA = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+# Typeface for all text; None is the font bundled with pygame, which --golden uses so its images
+# come out the same whatever fonts a machine has installed
+FONT_NAME = "Arial"
+
+def load_font(size):
+    if FONT_NAME is None:
+        return pygame.font.Font(None, size)
+    return pygame.font.SysFont(FONT_NAME, size)
+
 class Button:
     def __init__(self, x, y, width, height, text, font_size=24):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
-        self.font = pygame.font.SysFont('Arial', font_size)
+        self.font = load_font(font_size)
         self.hovered = False
         
     def draw(self, screen):
@@ -142,6 +820,8 @@ class Button:
                 return True
         return False
 
+SPAWN_LABELS = {}
+
 class SpawnPlatform:
     def __init__(self, x, y, width, height):
         self.x = x
@@ -150,14 +830,24 @@ class SpawnPlatform:
         self.height = height
         self.color = PLATFORM_COLOR
         
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.width, self.height))
-        pygame.draw.rect(screen, WHITE, (self.x, self.y, self.width, self.height), 2)
+    def frame_state(self):
+        return (self.x, self.y, self.width, self.height, self.color)
         
-        # Draw "SPAWN" text
-        font = pygame.font.SysFont('Arial', 16)
-        text = font.render("SPAWN", True, WHITE)
-        text_rect = text.get_rect(center=(self.x + self.width // 2, self.y + self.height // 2))
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
+        
+    @staticmethod
+    def render(screen, camera, x, y, width, height, color):
+        rect = camera.rect(x, y, width, height)
+        pygame.draw.rect(screen, color, rect)
+        pygame.draw.rect(screen, WHITE, rect, camera.line(2))
+        
+        # Draw "SPAWN" text, rendered once per scale and shared by every viewport
+        text = SPAWN_LABELS.get(camera.scale)
+        if text is None:
+            font = load_font(camera.size(16))
+            text = SPAWN_LABELS[camera.scale] = font.render("SPAWN", True, WHITE)
+        text_rect = text.get_rect(center=camera.point(x + width // 2, y + height // 2))
         screen.blit(text, text_rect)
         
     def get_rect(self):
@@ -174,29 +864,164 @@ class Obstacle:
         self.height = height
         self.type = obstacle_type
         self.color = DARK_GRAY if obstacle_type in ("rock", "rectangle", "circle", "triangle") else BROWN
+        self.build_shape()
         
-    def draw(self, screen):
-        if self.type == "rectangle" or self.type == "rock":
-            pygame.draw.rect(screen, self.color, (self.x, self.y, self.width, self.height))
-            pygame.draw.rect(screen, GRAY, (self.x+5, self.y+5, self.width-10, self.height-10), 2)
-        elif self.type == "circle":
-            pygame.draw.circle(screen, GRAY, (self.x+self.width//2, self.y+self.height//2), min(self.width, self.height)//2)
-            pygame.draw.circle(screen, DARK_GRAY, (self.x+self.width//2, self.y+self.height//2), min(self.width, self.height)//2-8, 2)
-        elif self.type == "triangle":
-            points = [
+    def build_shape(self):
+        # Exact collision geometry matching what draw() shows
+        if self.type == "circle":
+            self.center = (self.x + self.width // 2, self.y + self.height // 2)
+            self.circle_radius = min(self.width, self.height) // 2
+            self.vertices = ()
+            self.edges = []
+            return
+            
+        if self.type == "triangle":
+            self.vertices = (
                 (self.x + self.width // 2, self.y),
                 (self.x, self.y + self.height),
                 (self.x + self.width, self.y + self.height),
-            ]
+            )
+        else:
+            self.vertices = (
+                (self.x, self.y),
+                (self.x + self.width, self.y),
+                (self.x + self.width, self.y + self.height),
+                (self.x, self.y + self.height),
+            )
+        mid_x = sum(v[0] for v in self.vertices) / len(self.vertices)
+        mid_y = sum(v[1] for v in self.vertices) / len(self.vertices)
+        
+        # Edges as (ax, ay, bx, by, outward normal x, normal y, squared length)
+        self.edges = []
+        for i, (ax, ay) in enumerate(self.vertices):
+            bx, by = self.vertices[(i + 1) % len(self.vertices)]
+            length = math.hypot(bx - ax, by - ay)
+            nx, ny = (by - ay) / length, (ax - bx) / length
+            if (ax + bx) / 2 * nx + (ay + by) / 2 * ny < mid_x * nx + mid_y * ny:
+                nx, ny = -nx, -ny
+            self.edges.append((ax, ay, bx, by, nx, ny, length * length))
+            
+    def overlaps_circle(self, cx, cy, radius):
+        if self.type == "circle":
+            return circles_overlap(cx, cy, radius, self.center[0], self.center[1], self.circle_radius)
+            
+        inside = True
+        for ax, ay, bx, by, nx, ny, length_sq in self.edges:
+            if (cx - ax) * nx + (cy - ay) * ny > 0:
+                inside = False
+            # Distance to the edge segment
+            along = max(0.0, min(1.0, ((cx - ax) * (bx - ax) + (cy - ay) * (by - ay)) / length_sq))
+            px = ax + (bx - ax) * along - cx
+            py = ay + (by - ay) * along - cy
+            if px*px + py*py < radius*radius:
+                return True
+        return inside
+        
+    def contact_normal(self, cx, cy):
+        # Outward direction that separates an overlapping circle by the shortest way
+        if self.type == "circle":
+            nx = cx - self.center[0]
+            ny = cy - self.center[1]
+            length = math.hypot(nx, ny)
+            return (nx / length, ny / length) if length else (0.0, -1.0)
+            
+        inside = True
+        shallowest = None
+        nearest = None
+        for ax, ay, bx, by, nx, ny, length_sq in self.edges:
+            distance = (cx - ax) * nx + (cy - ay) * ny
+            if distance > 0:
+                inside = False
+            if shallowest is None or distance > shallowest[0]:
+                shallowest = (distance, nx, ny)
+            along = max(0.0, min(1.0, ((cx - ax) * (bx - ax) + (cy - ay) * (by - ay)) / length_sq))
+            px = cx - (ax + (bx - ax) * along)
+            py = cy - (ay + (by - ay) * along)
+            if nearest is None or px*px + py*py < nearest[0]:
+                nearest = (px*px + py*py, px, py)
+        if inside:
+            return shallowest[1], shallowest[2]
+        length = math.sqrt(nearest[0]) or 1.0
+        return nearest[1] / length, nearest[2] / length
+        
+    def sweep(self, x, y, radius, dx, dy):
+        # Circles already overlapping (e.g. an enemy that grew) may move out or along, never further in
+        if self.overlaps_circle(x, y, radius):
+            nx, ny = self.contact_normal(x, y)
+            if dx*nx + dy*ny >= 0:
+                return None
+            return (0.0, nx, ny)
+            
+        if self.type == "circle":
+            cx, cy = self.center
+            t = ray_circle_hit(x, y, dx, dy, cx, cy, self.circle_radius + radius)
+            if t is None:
+                return None
+            nx = x + dx * t - cx
+            ny = y + dy * t - cy
+            length = math.hypot(nx, ny) or 1.0
+            return (t, nx / length, ny / length)
+            
+        best = None
+        for ax, ay, bx, by, nx, ny, length_sq in self.edges:
+            approach = dx*nx + dy*ny
+            distance = (x - ax) * nx + (y - ay) * ny
+            if approach >= 0 or distance < radius:
+                continue
+            t = (distance - radius) / -approach
+            if t > 1 or (best is not None and t >= best[0]):
+                continue
+            # Face hit only if the contact lands on the edge itself; corners are handled below
+            along = ((x + dx*t - ax) * (bx - ax) + (y + dy*t - ay) * (by - ay)) / length_sq
+            if 0 <= along <= 1:
+                best = (t, nx, ny)
+                
+        for vx, vy in self.vertices:
+            t = ray_circle_hit(x, y, dx, dy, vx, vy, radius)
+            if t is not None and (best is None or t < best[0]):
+                nx = x + dx * t - vx
+                ny = y + dy * t - vy
+                length = math.hypot(nx, ny) or 1.0
+                best = (t, nx / length, ny / length)
+        return best
+        
+    def fill_shape(self, surface, color):
+        # The collision shape, filled, for baking into masks
+        if self.type == "circle":
+            pygame.draw.circle(surface, color, self.center, self.circle_radius)
+        else:
+            pygame.draw.polygon(surface, color, self.vertices)
+            
+    def frame_state(self):
+        return (self.type, self.x, self.y, self.width, self.height, self.color, self.vertices)
+        
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
+        
+    @staticmethod
+    def render(screen, camera, obstacle_type, x0, y0, width, height, color, vertices):
+        s = camera.size
+        left, top = camera.point(x0, y0)
+        if obstacle_type == "rectangle" or obstacle_type == "rock":
+            pygame.draw.rect(screen, color, (left, top, s(width), s(height)))
+            pygame.draw.rect(screen, GRAY, (left+s(5), top+s(5), s(width-10), s(height-10)), camera.line(2))
+        elif obstacle_type == "circle":
+            center = camera.point(x0+width//2, y0+height//2)
+            pygame.draw.circle(screen, GRAY, center, s(min(width, height)//2))
+            pygame.draw.circle(screen, DARK_GRAY, center, s(min(width, height)//2-8), camera.line(2))
+        elif obstacle_type == "triangle":
+            points = [camera.point(vx, vy) for vx, vy in vertices]
             pygame.draw.polygon(screen, BROWN, points)
-            pygame.draw.polygon(screen, DARK_GRAY, points, 2)
-        elif self.type == "brick":
-            pygame.draw.rect(screen, ORANGE, (self.x, self.y, self.width, self.height))
-            brick_h = 12
-            for y in range(self.y, self.y + self.height, brick_h):
-                pygame.draw.line(screen, BLACK, (self.x, y), (self.x+self.width, y), 1)
-                for x in range(self.x, self.x + self.width, 30):
-                    pygame.draw.line(screen, BLACK, (x, y), (x, y+brick_h), 1)
+            pygame.draw.polygon(screen, DARK_GRAY, points, camera.line(2))
+        elif obstacle_type == "brick":
+            pygame.draw.rect(screen, ORANGE, (left, top, s(width), s(height)))
+            right, bottom = camera.point(x0 + width, y0 + height)
+            for y in range(y0, y0 + height, 12):
+                row_top = top + s(y - y0)
+                row_bottom = top + s(y + 12 - y0)
+                pygame.draw.line(screen, BLACK, (left, row_top), (right, row_top), 1)
+                for x in range(x0, x0 + width, 30):
+                    pygame.draw.line(screen, BLACK, (left + s(x - x0), row_top), (left + s(x - x0), row_bottom), 1)
                     
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
@@ -214,111 +1039,170 @@ class Obstacle:
     def from_dict(cls, data):
         return cls(data["x"], data["y"], data["width"], data["height"], data["type"])
 
+ElementKind = namedtuple("ElementKind", ("draw", "update", "count"))
+
+def register_bg_element(name, draw, update=None, count=3):
+    # draw(screen, camera, x, y, size, angle) at screen coordinates; update(element, dt) moves it.
+    # count is how many of them a world listing the element gets.
+    BG_ELEMENTS[name] = ElementKind(draw, update, count)
+
 class BackgroundElement:
-    def __init__(self, x, y, element_type):
+    def __init__(self, x, y, element_type, area=None):
         self.x = x
         self.y = y
         self.type = element_type
+        # Resolved once here, so neither update nor drawing looks the kind up by name
+        kind = BG_ELEMENTS[element_type]
+        self.look = kind.draw
+        self.move = kind.update
+        # Region the element wraps around in; the whole screen by default
+        self.area = area if area is not None else pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
         self.speed = random.uniform(0.5, 2.0)
         self.size = random.randint(20, 60)
         self.angle = random.uniform(0, 360)
         self.pulse = 0
         
-    def update(self):
-        self.pulse += 0.05
+    def update(self, dt=1):
+        self.pulse += 0.05 * dt
+        if self.move is not None:
+            self.move(self, dt)
         
-        if self.type == "cloud":
-            self.x += self.speed
-            if self.x > SCREEN_WIDTH + 100:
-                self.x = -100
-                self.y = random.randint(50, 200)
-                
-        elif self.type == "bat":
-            self.x += self.speed * 2
-            self.y += math.sin(self.pulse) * 2
-            if self.x > SCREEN_WIDTH + 50:
-                self.x = -50
-                self.y = random.randint(100, SCREEN_HEIGHT - 100)
-                
-        elif self.type == "water_drop":
-            self.y += self.speed * 3
-            if self.y > SCREEN_HEIGHT:
-                self.y = -20
-                self.x = random.randint(0, SCREEN_WIDTH)
-                
-        elif self.type == "smoke":
-            self.y -= self.speed
-            self.x += math.sin(self.pulse) * 0.5
-            self.size += 0.2
-            if self.y < -50:
-                self.y = SCREEN_HEIGHT + 20
-                self.x = random.randint(0, SCREEN_WIDTH)
-                self.size = random.randint(20, 40)
-                
-        elif self.type == "lava_bubble":
-            self.y -= self.speed * 2
-            if self.y < 0:
-                self.y = SCREEN_HEIGHT + 20
-                self.x = random.randint(0, SCREEN_WIDTH)
-                
-    def draw(self, screen):
-        if self.type == "tree":
-            pygame.draw.rect(screen, BROWN, (self.x - 10, self.y, 20, 40))
-            pygame.draw.circle(screen, DARK_GREEN, (self.x, self.y - 10), 30)
-            pygame.draw.circle(screen, GREEN, (self.x, self.y - 10), 25)
-            
-        elif self.type == "cloud":
-            for i in range(3):
-                offset_x = i * 25 - 25
-                pygame.draw.circle(screen, WHITE, (int(self.x + offset_x), int(self.y)), 20)
-            pygame.draw.circle(screen, WHITE, (int(self.x - 10), int(self.y - 10)), 15)
-            pygame.draw.circle(screen, WHITE, (int(self.x + 10), int(self.y - 10)), 15)
-            
-        elif self.type == "mountain":
-            points = [(self.x, self.y + 100), (self.x - 80, self.y + 100), (self.x, self.y - 50)]
-            pygame.draw.polygon(screen, GRAY, points)
-            points = [(self.x, self.y - 50), (self.x - 30, self.y - 20), (self.x + 30, self.y - 20)]
-            pygame.draw.polygon(screen, WHITE, points)
-            
-        elif self.type == "crystal":
-            self.angle += 1
-            points = []
-            for i in range(6):
-                angle = self.angle + i * 60
-                x = self.x + math.cos(math.radians(angle)) * self.size
-                y = self.y + math.sin(math.radians(angle)) * self.size
-                points.append((x, y))
-            pygame.draw.polygon(screen, PURPLE, points)
-            pygame.draw.polygon(screen, PINK, points, 2)
-            
-        elif self.type == "rock":
-            pygame.draw.circle(screen, DARK_GRAY, (int(self.x), int(self.y)), self.size)
-            pygame.draw.circle(screen, GRAY, (int(self.x - 5), int(self.y - 5)), self.size - 10)
-            
-        elif self.type == "tunnel":
-            pygame.draw.ellipse(screen, BLACK, (self.x - 40, self.y - 30, 80, 60))
-            pygame.draw.ellipse(screen, DARK_GRAY, (self.x - 40, self.y - 30, 80, 60), 3)
-            
-        elif self.type == "stalactite":
-            points = [(self.x, self.y), (self.x - 15, self.y + 40), (self.x + 15, self.y + 40)]
-            pygame.draw.polygon(screen, GRAY, points)
-            pygame.draw.polygon(screen, DARK_GRAY, points, 2)
-            
-        elif self.type == "bat":
-            pygame.draw.ellipse(screen, BLACK, (self.x - 15, self.y - 5, 30, 10))
-            pygame.draw.polygon(screen, BLACK, [(self.x - 15, self.y), (self.x - 25, self.y - 10), (self.x - 25, self.y + 10)])
-            pygame.draw.polygon(screen, BLACK, [(self.x + 15, self.y), (self.x + 25, self.y - 10), (self.x + 25, self.y + 10)])
-            
-        elif self.type == "water_drop":
-            pygame.draw.circle(screen, BLUE, (int(self.x), int(self.y)), 5)
-            pygame.draw.circle(screen, LIGHT_BLUE, (int(self.x - 1), int(self.y - 1)), 3)
-            
-        elif self.type == "smoke":
-            pygame.draw.circle(screen, GRAY, (int(self.x), int(self.y)), int(self.size))
-            
-        elif self.type == "lava_bubble":
-            pygame.draw.circle(screen, ORANGE, (int(self.x), int(self.y)), int(self.size))
-            pygame.draw.circle(screen, YELLOW, (int(self.x - 3), int(self.y - 3)), int(self.size - 5))
+    def frame_state(self):
+        return (self.look, self.x, self.y, self.size, self.angle)
+        
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
+        
+    @staticmethod
+    def render(screen, camera, look, x, y, size, angle):
+        look(screen, camera, *camera.point(x, y), size, angle)
+
+def drift_cloud(element, dt):
+    area = element.area
+    element.x += element.speed * dt
+    if element.x > area.right + 100:
+        element.x = area.left - 100
+        element.y = random.randint(area.top + 50, area.top + 200)
+
+def fly_bat(element, dt):
+    area = element.area
+    element.x += element.speed * 2 * dt
+    element.y += math.sin(element.pulse) * 2 * dt
+    if element.x > area.right + 50:
+        element.x = area.left - 50
+        element.y = random.randint(area.top + 100, area.bottom - 100)
+
+def fall_water_drop(element, dt):
+    area = element.area
+    element.y += element.speed * 3 * dt
+    if element.y > area.bottom:
+        element.y = area.top - 20
+        element.x = random.randint(area.left, area.right)
+
+def rise_smoke(element, dt):
+    area = element.area
+    element.y -= element.speed * dt
+    element.x += math.sin(element.pulse) * 0.5 * dt
+    element.size += 0.2 * dt
+    if element.y < area.top - 50:
+        element.y = area.bottom + 20
+        element.x = random.randint(area.left, area.right)
+        element.size = random.randint(20, 40)
+
+def spin_crystal(element, dt):
+    element.angle += dt
+
+def rise_lava_bubble(element, dt):
+    area = element.area
+    element.y -= element.speed * 2 * dt
+    if element.y < area.top:
+        element.y = area.bottom + 20
+        element.x = random.randint(area.left, area.right)
+
+def draw_tree(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.rect(screen, BROWN, (x - s(10), y, s(20), s(40)))
+    pygame.draw.circle(screen, DARK_GREEN, (x, y - s(10)), s(30))
+    pygame.draw.circle(screen, GREEN, (x, y - s(10)), s(25))
+
+def draw_cloud(screen, camera, x, y, size, angle):
+    s = camera.size
+    for i in range(3):
+        offset_x = i * 25 - 25
+        pygame.draw.circle(screen, WHITE, (x + s(offset_x), y), s(20))
+    pygame.draw.circle(screen, WHITE, (x - s(10), y - s(10)), s(15))
+    pygame.draw.circle(screen, WHITE, (x + s(10), y - s(10)), s(15))
+
+def draw_mountain(screen, camera, x, y, size, angle):
+    s = camera.size
+    points = [(x, y + s(100)), (x - s(80), y + s(100)), (x, y - s(50))]
+    pygame.draw.polygon(screen, GRAY, points)
+    points = [(x, y - s(50)), (x - s(30), y - s(20)), (x + s(30), y - s(20))]
+    pygame.draw.polygon(screen, WHITE, points)
+
+def draw_crystal(screen, camera, x, y, size, angle):
+    s = camera.size
+    points = []
+    for i in range(6):
+        corner = angle + i * 60
+        points.append((x + math.cos(math.radians(corner)) * s(size),
+                       y + math.sin(math.radians(corner)) * s(size)))
+    pygame.draw.polygon(screen, PURPLE, points)
+    pygame.draw.polygon(screen, PINK, points, camera.line(2))
+
+def draw_rock(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.circle(screen, DARK_GRAY, (x, y), s(size))
+    pygame.draw.circle(screen, GRAY, (x - s(5), y - s(5)), s(size - 10))
+
+def draw_tunnel(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.ellipse(screen, BLACK, (x - s(40), y - s(30), s(80), s(60)))
+    pygame.draw.ellipse(screen, DARK_GRAY, (x - s(40), y - s(30), s(80), s(60)), camera.line(3))
+
+def draw_stalactite(screen, camera, x, y, size, angle):
+    s = camera.size
+    points = [(x, y), (x - s(15), y + s(40)), (x + s(15), y + s(40))]
+    pygame.draw.polygon(screen, GRAY, points)
+    pygame.draw.polygon(screen, DARK_GRAY, points, camera.line(2))
+
+def draw_bat(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.ellipse(screen, BLACK, (x - s(15), y - s(5), s(30), s(10)))
+    pygame.draw.polygon(screen, BLACK, [(x - s(15), y), (x - s(25), y - s(10)), (x - s(25), y + s(10))])
+    pygame.draw.polygon(screen, BLACK, [(x + s(15), y), (x + s(25), y - s(10)), (x + s(25), y + s(10))])
+
+def draw_water_drop(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.circle(screen, BLUE, (x, y), s(5))
+    pygame.draw.circle(screen, LIGHT_BLUE, (x - s(1), y - s(1)), s(3))
+
+def draw_smoke(screen, camera, x, y, size, angle):
+    pygame.draw.circle(screen, GRAY, (x, y), camera.size(size))
+
+def draw_lava_bubble(screen, camera, x, y, size, angle):
+    s = camera.size
+    pygame.draw.circle(screen, ORANGE, (x, y), s(size))
+    pygame.draw.circle(screen, YELLOW, (x - s(3), y - s(3)), s(size - 5))
+
+register_bg_element("tree", draw_tree)
+register_bg_element("cloud", draw_cloud, drift_cloud, count=5)
+register_bg_element("mountain", draw_mountain)
+register_bg_element("crystal", draw_crystal, spin_crystal)
+register_bg_element("rock", draw_rock)
+register_bg_element("tunnel", draw_tunnel)
+register_bg_element("stalactite", draw_stalactite)
+register_bg_element("bat", draw_bat, fly_bat, count=5)
+register_bg_element("water_drop", draw_water_drop, fall_water_drop, count=5)
+register_bg_element("smoke", draw_smoke, rise_smoke, count=5)
+register_bg_element("lava_bubble", draw_lava_bubble, rise_lava_bubble, count=5)
+
+PowerKind = namedtuple("PowerKind", ("color", "symbol", "activate", "deactivate"))
+
+def register_power_up(name, color, symbol, activate, deactivate):
+    # symbol(screen, camera, x, y) draws on the disc at screen coordinates;
+    # activate(game) and deactivate(game) start and end the power for the whole team
+    POWER_UPS[name] = PowerKind(color, symbol, activate, deactivate)
 
 class PowerUp:
     def __init__(self, x, y, power_type):
@@ -326,36 +1210,32 @@ class PowerUp:
         self.y = y
         self.radius = 20
         self.type = power_type
+        kind = POWER_UPS[power_type]
+        self.color = kind.color
+        self.symbol = kind.symbol
         self.duration = 300
         self.pulse = 0
         self.collected = False
-        self.colors = {
-            "speed": GREEN,
-            "shield": BLUE,
-            "freeze": CYAN
-        }
         
-    def update(self):
-        self.pulse += 0.1
+    def update(self, dt=1):
+        self.pulse += 0.1 * dt
+        
+    def frame_state(self):
+        return (self.color, self.symbol, self.x, self.y, self.radius, self.pulse, self.collected)
+        
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
+        
+    @staticmethod
+    def render(screen, camera, color, symbol, x, y, radius, pulse, collected):
+        s = camera.size
+        x, y = camera.point(x, y)
+        if not collected:
+            pulse_radius = radius + math.sin(pulse) * 3
+            pygame.draw.circle(screen, WHITE, (x, y), s(pulse_radius + 3))
+            pygame.draw.circle(screen, color, (x, y), s(pulse_radius))
+            symbol(screen, camera, x, y)
         
-    def draw(self, screen):
-        if not self.collected:
-            pulse_radius = self.radius + math.sin(self.pulse) * 3
-            pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), int(pulse_radius + 3))
-            pygame.draw.circle(screen, self.colors[self.type], (int(self.x), int(self.y)), int(pulse_radius))
-            
-            if self.type == "speed":
-                points = [(self.x - 5, self.y - 10), (self.x + 2, self.y - 2), 
-                         (self.x - 2, self.y + 2), (self.x + 5, self.y + 10)]
-                pygame.draw.lines(screen, WHITE, False, points, 3)
-            elif self.type == "shield":
-                pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), 10, 2)
-            elif self.type == "freeze":
-                for angle in range(0, 360, 60):
-                    end_x = self.x + math.cos(math.radians(angle)) * 10
-                    end_y = self.y + math.sin(math.radians(angle)) * 10
-                    pygame.draw.line(screen, WHITE, (self.x, self.y), (end_x, end_y), 2)
-    
     def get_rect(self):
         return pygame.Rect(self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2)
     
@@ -372,85 +1252,148 @@ class PowerUp:
         power_up = cls(data["x"], data["y"], data["type"])
         power_up.collected = data["collected"]
         return power_up
+    
+    # Compact binary form used by the rewind buffer
+    SNAPSHOT = struct.Struct("<dddB?")
+    
+    def pack_into(self, buffer, offset):
+        self.SNAPSHOT.pack_into(buffer, offset, self.x, self.y, self.pulse,
+                                POWER_TYPES.index(self.type), self.collected)
+    
+    @classmethod
+    def unpack_from(cls, buffer, offset):
+        x, y, pulse, type_index, collected = cls.SNAPSHOT.unpack_from(buffer, offset)
+        power_up = cls(x, y, POWER_TYPES[type_index])
+        power_up.pulse = pulse
+        power_up.collected = collected
+        return power_up
+
+def speed_symbol(screen, camera, x, y):
+    s = camera.size
+    points = [(x - s(5), y - s(10)), (x + s(2), y - s(2)),
+              (x - s(2), y + s(2)), (x + s(5), y + s(10))]
+    pygame.draw.lines(screen, WHITE, False, points, camera.line(3))
+
+def shield_symbol(screen, camera, x, y):
+    pygame.draw.circle(screen, WHITE, (x, y), camera.size(10), camera.line(2))
+
+def freeze_symbol(screen, camera, x, y):
+    s = camera.size
+    for angle in range(0, 360, 60):
+        end_x = x + math.cos(math.radians(angle)) * s(10)
+        end_y = y + math.sin(math.radians(angle)) * s(10)
+        pygame.draw.line(screen, WHITE, (x, y), (end_x, end_y), camera.line(2))
+
+# Powers are shared by the whole team
+def speed_up(game):
+    for player in game.players:
+        player.speed = player.base_speed * 1.5
+
+def slow_down(game):
+    for player in game.players:
+        player.speed = player.base_speed
+
+def raise_shield(game):
+    for player in game.players:
+        player.shield_active = True
+
+def lower_shield(game):
+    for player in game.players:
+        player.shield_active = False
+
+def freeze_enemies(game):
+    for enemy in game.enemies:
+        enemy.freeze()
+
+def thaw_enemies(game):
+    for enemy in game.enemies:
+        enemy.unfreeze()
+
+# In POWER_TYPES order, the only kinds a rewind snapshot can hold
+register_power_up("speed", GREEN, speed_symbol, speed_up, slow_down)
+register_power_up("shield", BLUE, shield_symbol, raise_shield, lower_shield)
+register_power_up("freeze", CYAN, freeze_symbol, freeze_enemies, thaw_enemies)
+
+# Translucent circles pre-rendered once per size, colour and alpha
+CIRCLE_SPRITES = {}
+
+def translucent_circle(radius, color, alpha):
+    key = (radius, color, alpha)
+    sprite = CIRCLE_SPRITES.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (*color, alpha), (radius, radius), radius)
+        CIRCLE_SPRITES[key] = sprite
+    return sprite
 
 class Player:
-    def __init__(self, x, y):
+    def __init__(self, x, y, controls=ANY_CONTROLS, color=BLUE):
         self.radius = 15
         self.x = x
         self.y = y
         self.speed = 5
         self.base_speed = 5
-        self.color = BLUE
+        self.color = color
+        self.controls = controls
         self.trail = []
         self.max_trail_length = 20
         self.shield_active = False
-        self.shield_timer = 0
         
-    def move(self, keys, obstacles):
+    def move(self, keys, obstacles, bounds=(SCREEN_WIDTH, SCREEN_HEIGHT), dt=1):
         self.trail.append((self.x, self.y))
         if len(self.trail) > self.max_trail_length:
             self.trail.pop(0)
             
-        new_x, new_y = self.x, self.y
+        dx = dy = 0
+        step = self.speed * dt
+        left, right, up, down = self.controls
         
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            new_x -= self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            new_x += self.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            new_y -= self.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            new_y += self.speed
+        if any(keys[key] for key in left):
+            dx -= step
+        if any(keys[key] for key in right):
+            dx += step
+        if any(keys[key] for key in up):
+            dy -= step
+        if any(keys[key] for key in down):
+            dy += step
             
+        # Swept against the obstacles, so large steps cannot tunnel through them
+        new_x, new_y, _ = move_circle(self.x, self.y, self.radius, dx, dy, obstacles)
+        
         border_off = BORDER_THICKNESS
-        new_x = max(self.radius + border_off, min(SCREEN_WIDTH - border_off - self.radius, new_x))
-        new_y = max(self.radius + border_off, min(SCREEN_HEIGHT - border_off - self.radius, new_y))
+        arena_width, arena_height = bounds
+        self.x = max(self.radius + border_off, min(arena_width - border_off - self.radius, new_x))
+        self.y = max(self.radius + border_off, min(arena_height - border_off - self.radius, new_y))
+                
+    def frame_state(self):
+        return (self.x, self.y, self.radius, self.color, self.shield_active, tuple(self.trail))
         
-        player_rect = pygame.Rect(new_x - self.radius, new_y - self.radius, self.radius * 2, self.radius * 2)
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, self.x, self.y, self.radius, self.color, self.shield_active, self.trail)
         
-        collision = False
-        for obs in obstacles:
-            if player_rect.colliderect(obs.get_rect()):
-                collision = True
-                break
-                
-        if not collision:
-            self.x, self.y = new_x, new_y
-            
-        if self.shield_active:
-            self.shield_timer -= 1
-            if self.shield_timer <= 0:
-                self.shield_active = False
-                
-    def activate_power(self, power_type):
-        if power_type == "speed":
-            self.speed = self.base_speed * 1.5
-        elif power_type == "shield":
-            self.shield_active = True
-            self.shield_timer = 300
-            
-    def deactivate_power(self, power_type):
-        if power_type == "speed":
-            self.speed = self.base_speed
-            
-    def draw(self, screen):
-        # Draw trail
-        for i, pos in enumerate(self.trail):
-            alpha = int(255 * (i / len(self.trail)))
-            radius = int(self.radius * (i / len(self.trail)))
-            if radius > 0:
-                s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, (*self.color, alpha), (radius, radius), radius)
-                screen.blit(s, (int(pos[0]-radius), int(pos[1]-radius)))
+    @staticmethod
+    def render(screen, camera, x, y, radius, color, shield_active, trail):
+        s = camera.size
+        x, y = camera.point(x, y)
+        # Draw trail, from cached sprites in one batched blit
+        sprites = []
+        for i, pos in enumerate(trail):
+            alpha = int(255 * (i / len(trail)))
+            trail_radius = s(radius * (i / len(trail)))
+            if trail_radius > 0:
+                trail_x, trail_y = camera.point(pos[0], pos[1])
+                sprites.append((translucent_circle(trail_radius, color, alpha),
+                                (trail_x - trail_radius, trail_y - trail_radius)))
+        screen.blits(sprites, doreturn=False)
         
         # Thick outline for visibility
-        pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), self.radius + 6)
-        pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), self.radius + 3)
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
+        pygame.draw.circle(screen, BLACK, (x, y), s(radius + 6))
+        pygame.draw.circle(screen, WHITE, (x, y), s(radius + 3))
+        pygame.draw.circle(screen, color, (x, y), s(radius))
         
-        if self.shield_active:
-            shield_radius = self.radius + 10 + math.sin(pygame.time.get_ticks() * 0.01) * 3
-            pygame.draw.circle(screen, (100, 100, 255, 128), (int(self.x), int(self.y)), int(shield_radius), 3)
+        if shield_active:
+            shield_radius = radius + 10 + math.sin(pygame.time.get_ticks() * 0.01) * 3
+            pygame.draw.circle(screen, (100, 100, 255, 128), (x, y), s(shield_radius), camera.line(3))
             
     def get_rect(self):
         return pygame.Rect(self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2)
@@ -462,7 +1405,6 @@ class Player:
             "speed": self.speed,
             "base_speed": self.base_speed,
             "shield_active": self.shield_active,
-            "shield_timer": self.shield_timer,
             "trail": self.trail[-10:]
         }
     
@@ -472,10 +1414,11 @@ class Player:
         self.speed = data["speed"]
         self.base_speed = data["base_speed"]
         self.shield_active = data["shield_active"]
-        self.shield_timer = data["shield_timer"]
         self.trail = data.get("trail", [])
 
 class Enemy:
+    kind = "chaser"  # Name in ENEMY_TYPES; plugin subclasses register their own
+    
     def __init__(self, x, y, speed, color):
         self.radius = 20
         self.base_radius = 20
@@ -489,55 +1432,70 @@ class Enemy:
         self.vision_range = 200
         self.base_vision_range = 200
         self.frozen = False
-        self.freeze_timer = 0
         self.enraged = False
+        # Per-tick step along the last planned move, and ticks left on it
+        self.glide_x = 0
+        self.glide_y = 0
+        self.glide_ticks = 0
         
-    def update(self, player, obstacles):
+    def update(self, player, obstacles, bounds=(SCREEN_WIDTH, SCREEN_HEIGHT), dt=1, steer=(0.0, 0.0),
+               visibility=None):
         if self.frozen:
-            self.freeze_timer -= 1
-            if self.freeze_timer <= 0:
-                self.frozen = False
-                self.speed = self.base_speed * (1.5 if self.enraged else 1)
             return
             
         dx = player.x - self.x
         dy = player.y - self.y
         distance = math.sqrt(dx**2 + dy**2)
         
-        if distance < self.vision_range:
+        if distance < self.vision_range and (visibility is None or self.sees(player, visibility)):
             self.direction = math.atan2(dy, dx)
         else:
-            self.change_direction_timer -= 1
+            self.change_direction_timer -= dt
             if self.change_direction_timer <= 0:
                 self.direction += random.uniform(-math.pi/4, math.pi/4)
                 self.change_direction_timer = random.randint(30, 90)
-        
-        new_x = self.x + self.speed * math.cos(self.direction)
-        new_y = self.y + self.speed * math.sin(self.direction)
-        
-        enemy_rect = pygame.Rect(new_x - self.radius, new_y - self.radius, self.radius*2, self.radius*2)
-        
-        collision = False
-        for obstacle in obstacles:
-            if enemy_rect.colliderect(obstacle.get_rect()):
-                collision = True
-                self.direction += math.pi / 2
-                break
                 
-        if not collision:
-            self.x = new_x
-            self.y = new_y
-        else:
-            self.x += self.speed * math.cos(self.direction)
-            self.y += self.speed * math.sin(self.direction)
+        steer_x, steer_y = steer
+        if steer_x or steer_y:
+            self.direction = math.atan2(math.sin(self.direction) + steer_y, math.cos(self.direction) + steer_x)
+        
+        step = self.speed * dt
+        self.x, self.y, collision = move_circle(self.x, self.y, self.radius,
+                                                step * math.cos(self.direction),
+                                                step * math.sin(self.direction), obstacles)
+        if collision:
+            self.direction += math.pi / 2
             
-        if self.x <= self.radius + BORDER_THICKNESS or self.x >= SCREEN_WIDTH - self.radius - BORDER_THICKNESS:
+        arena_width, arena_height = bounds
+        if self.x <= self.radius + BORDER_THICKNESS or self.x >= arena_width - self.radius - BORDER_THICKNESS:
             self.direction = math.pi - self.direction
-        if self.y <= self.radius + BORDER_THICKNESS or self.y >= SCREEN_HEIGHT - self.radius - BORDER_THICKNESS:
+        if self.y <= self.radius + BORDER_THICKNESS or self.y >= arena_height - self.radius - BORDER_THICKNESS:
             self.direction = -self.direction
             
-        self.x = max(self.radius + BORDER_THICKNESS, min(SCREEN_WIDTH - self.radius - BORDER_THICKNESS, self.x))
-        self.y = max(self.radius + BORDER_THICKNESS, min(SCREEN_HEIGHT - self.radius - BORDER_THICKNESS, self.y))
+        self.x = max(self.radius + BORDER_THICKNESS, min(arena_width - self.radius - BORDER_THICKNESS, self.x))
+        self.y = max(self.radius + BORDER_THICKNESS, min(arena_height - self.radius - BORDER_THICKNESS, self.y))
+        
+    def sees(self, player, visibility):
+        return visibility.line_of_sight(self.x, self.y, player.x, player.y)
+        
+    def is_distant(self, player):
+        reach = self.vision_range + AI_LOD_MARGIN
+        return (player.x - self.x) ** 2 + (player.y - self.y) ** 2 > reach * reach
+        
+    def plan(self, player, obstacles, bounds, ticks, steer=(0.0, 0.0), visibility=None):
+        # One full update covering several ticks; the enemy then glides there a tick at a time.
+        # The swept move already cleared the whole segment, so gliding needs no collision checks.
+        x, y = self.x, self.y
+        self.update(player, obstacles, bounds, ticks, steer, visibility)
+        self.glide_x = (self.x - x) / ticks
+        self.glide_y = (self.y - y) / ticks
+        self.glide_ticks = ticks
+        self.x, self.y = x, y
+        
+    def glide(self, ticks):
+        self.x += self.glide_x * ticks
+        self.y += self.glide_y * ticks
+        self.glide_ticks -= ticks
         
     def make_enraged(self):
         self.enraged = True
@@ -553,31 +1511,44 @@ class Enemy:
         
     def freeze(self):
         self.frozen = True
-        self.freeze_timer = 300
         self.speed = 0
         
-    def draw(self, screen):
-        color = self.color if not self.frozen else (100, 100, 100)
-        if self.enraged:
-            pygame.draw.circle(screen, RED, (int(self.x), int(self.y)), int(self.radius + 5))
+    def unfreeze(self):
+        self.frozen = False
+        self.speed = self.base_speed * (1.5 if self.enraged else 1)
         
-        pygame.draw.circle(screen, color, (int(self.x), int(self.y)), int(self.radius))
+    def frame_state(self):
+        return (self.x, self.y, self.radius, self.base_radius, self.color, self.frozen, self.enraged)
         
-        eye_offset = int(7 * (self.radius / self.base_radius))
-        eye_radius = int(4 * (self.radius / self.base_radius))
-        pygame.draw.circle(screen, WHITE, (int(self.x - eye_offset), int(self.y - eye_offset)), eye_radius)
-        pygame.draw.circle(screen, WHITE, (int(self.x + eye_offset), int(self.y - eye_offset)), eye_radius)
-        pygame.draw.circle(screen, BLACK, (int(self.x - eye_offset), int(self.y - eye_offset)), 2)
-        pygame.draw.circle(screen, BLACK, (int(self.x + eye_offset), int(self.y - eye_offset)), 2)
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
         
-        if self.frozen:
-            pygame.draw.circle(screen, (200, 200, 255), (int(self.x), int(self.y)), int(self.radius + 5), 3)
+    @staticmethod
+    def render(screen, camera, x, y, radius, base_radius, color, frozen, enraged):
+        s = camera.size
+        x, y = camera.point(x, y)
+        if frozen:
+            color = (100, 100, 100)
+        if enraged:
+            pygame.draw.circle(screen, RED, (x, y), s(radius + 5))
+        
+        pygame.draw.circle(screen, color, (x, y), s(radius))
         
-        if self.enraged and not self.frozen:
-            pygame.draw.line(screen, RED, (self.x - eye_offset - 5, self.y - eye_offset - 5), 
-                             (self.x - eye_offset + 5, self.y - eye_offset - 10), 2)
-            pygame.draw.line(screen, RED, (self.x + eye_offset - 5, self.y - eye_offset - 10), 
-                             (self.x + eye_offset + 5, self.y - eye_offset - 5), 2)
+        eye_offset = s(7 * (radius / base_radius))
+        eye_radius = s(4 * (radius / base_radius))
+        pygame.draw.circle(screen, WHITE, (x - eye_offset, y - eye_offset), eye_radius)
+        pygame.draw.circle(screen, WHITE, (x + eye_offset, y - eye_offset), eye_radius)
+        pygame.draw.circle(screen, BLACK, (x - eye_offset, y - eye_offset), s(2))
+        pygame.draw.circle(screen, BLACK, (x + eye_offset, y - eye_offset), s(2))
+        
+        if frozen:
+            pygame.draw.circle(screen, (200, 200, 255), (x, y), s(radius + 5), camera.line(3))
+        
+        if enraged and not frozen:
+            pygame.draw.line(screen, RED, (x - eye_offset - s(5), y - eye_offset - s(5)), 
+                             (x - eye_offset + s(5), y - eye_offset - s(10)), camera.line(2))
+            pygame.draw.line(screen, RED, (x + eye_offset - s(5), y - eye_offset - s(10)), 
+                             (x + eye_offset + s(5), y - eye_offset - s(5)), camera.line(2))
             
     def get_rect(self):
         return pygame.Rect(self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2)
@@ -593,66 +1564,93 @@ class Enemy:
             "vision_range": self.vision_range,
             "base_vision_range": self.base_vision_range,
             "frozen": self.frozen,
-            "freeze_timer": self.freeze_timer,
             "enraged": self.enraged,
             "radius": self.radius,
-            "base_radius": self.base_radius
+            "base_radius": self.base_radius,
+            "kind": self.kind
         }
     
     @classmethod
     def from_dict(cls, data):
-        enemy = cls(data["x"], data["y"], data["base_speed"], data["color"])
+        # An enemy of a plugin that is no longer loaded comes back as a plain chaser
+        enemy = ENEMY_TYPES.get(data.get("kind"), cls)(data["x"], data["y"], data["base_speed"], data["color"])
         enemy.speed = data["speed"]
         enemy.direction = data["direction"]
         enemy.vision_range = data["vision_range"]
         enemy.base_vision_range = data["base_vision_range"]
         enemy.frozen = data["frozen"]
-        enemy.freeze_timer = data["freeze_timer"]
         enemy.enraged = data["enraged"]
         enemy.radius = data["radius"]
         enemy.base_radius = data["base_radius"]
         return enemy
+    
+    # Compact binary form used by the rewind buffer
+    SNAPSHOT = struct.Struct("<dddddddi??BBB")
+    
+    def pack_into(self, buffer, offset):
+        r, g, b = self.color
+        self.SNAPSHOT.pack_into(buffer, offset, self.x, self.y, self.speed, self.base_speed,
+                                self.direction, self.vision_range, self.radius,
+                                self.change_direction_timer, self.frozen, self.enraged, r, g, b)
+        
+    def unpack_from(self, buffer, offset):
+        (self.x, self.y, self.speed, self.base_speed, self.direction, self.vision_range,
+         self.radius, self.change_direction_timer, self.frozen, self.enraged, r, g, b) = self.SNAPSHOT.unpack_from(buffer, offset)
+        self.color = (r, g, b)
+        self.glide_ticks = 0
+
+def register_enemy_type(name, enemy_class):
+    # A subclass of Enemy; it may override update (with plan and glide for distant enemies) and render
+    enemy_class.kind = name
+    ENEMY_TYPES[name] = enemy_class
+
+register_enemy_type("chaser", Enemy)
 
 class Portal:
     def __init__(self, world_config):
         self.radius = 30
-        self.x = random.randint(self.radius + BORDER_THICKNESS, SCREEN_WIDTH - self.radius - BORDER_THICKNESS)
-        self.y = random.randint(self.radius + BORDER_THICKNESS, SCREEN_HEIGHT - self.radius - BORDER_THICKNESS)
+        self.place()
         self.color = world_config["portal_color"]
         self.pulse = 0
         self.visible = True
         self.visible_time = world_config["portal_visible_time"] * 1000
         self.hidden_time = world_config["portal_hidden_time"] * 1000
-        self.last_toggle = pygame.time.get_ticks()
         
-    def update(self):
-        self.pulse += 0.1
-        current_time = pygame.time.get_ticks()
+    def place(self, area=None):
+        if area is None:
+            area = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.x = random.randint(area.left + self.radius + BORDER_THICKNESS, area.right - self.radius - BORDER_THICKNESS)
+        self.y = random.randint(area.top + self.radius + BORDER_THICKNESS, area.bottom - self.radius - BORDER_THICKNESS)
         
-        if self.visible:
-            if current_time - self.last_toggle > self.visible_time:
-                self.visible = False
-                self.last_toggle = current_time
-                return True
-        else:
-            if current_time - self.last_toggle > self.hidden_time:
-                self.visible = True
-                self.last_toggle = current_time
-                return False
-                
-        return None
+    def update(self, dt=1):
+        self.pulse += 0.1 * dt
         
-    def draw(self, screen):
-        if self.visible:
-            pulse_radius = self.radius + math.sin(self.pulse) * 5
+    def toggle(self):
+        # Flip visibility and return how many ticks the new phase lasts
+        self.visible = not self.visible
+        phase_time = self.visible_time if self.visible else self.hidden_time
+        return phase_time * FPS // 1000
+        
+    def frame_state(self):
+        return (self.x, self.y, self.radius, self.pulse, self.color, self.visible)
+        
+    def draw(self, screen, camera=SCREEN_CAMERA):
+        self.render(screen, camera, *self.frame_state())
+        
+    @staticmethod
+    def render(screen, camera, x, y, radius, pulse, color, visible):
+        s = camera.size
+        x, y = camera.point(x, y)
+        if visible:
+            pulse_radius = radius + math.sin(pulse) * 5
             
             for i in range(3):
                 alpha = 100 - i * 30
-                radius = pulse_radius + i * 10
-                pygame.draw.circle(screen, (*self.color, alpha), (int(self.x), int(self.y)), int(radius), 2)
+                ring_radius = pulse_radius + i * 10
+                pygame.draw.circle(screen, (*color, alpha), (x, y), s(ring_radius), camera.line(2))
             
-            pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), int(pulse_radius))
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(pulse_radius - 5))
+            pygame.draw.circle(screen, WHITE, (x, y), s(pulse_radius))
+            pygame.draw.circle(screen, color, (x, y), s(pulse_radius - 5))
         
     def get_rect(self):
         return pygame.Rect(self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2)
@@ -663,7 +1661,6 @@ class Portal:
             "y": self.y,
             "color": self.color,
             "visible": self.visible,
-            "last_toggle": self.last_toggle,
             "visible_time": self.visible_time,
             "hidden_time": self.hidden_time
         }
@@ -673,26 +1670,1057 @@ class Portal:
         self.y = data["y"]
         self.color = data["color"]
         self.visible = data["visible"]
-        self.last_toggle = data["last_toggle"]
         self.visible_time = data["visible_time"]
         self.hidden_time = data["hidden_time"]
 
+class Chunk:
+    def __init__(self, key, area):
+        self.key = key
+        self.area = area
+        self.obstacles = []
+        self.enemies = []
+        self.background_elements = []
+
+class ChunkWorld:
+    """Generates open-world chunks on demand and streams them around the camera"""
+    def __init__(self, world_config, seed, arena_width, arena_height):
+        self.world_config = world_config
+        self.seed = seed
+        self.cols = arena_width // CHUNK_SIZE
+        self.rows = arena_height // CHUNK_SIZE
+        self.chunks = {}
+        # Chunk contents are scaled from the per-screen counts of the world
+        self.density = CHUNK_SIZE * CHUNK_SIZE / (SCREEN_WIDTH * SCREEN_HEIGHT)
+        
+    def chunk_key(self, x, y):
+        return (int(x) // CHUNK_SIZE, int(y) // CHUNK_SIZE)
+        
+    def keys_in(self, rect):
+        first_col = max(0, rect.left // CHUNK_SIZE)
+        last_col = min(self.cols - 1, (rect.right - 1) // CHUNK_SIZE)
+        first_row = max(0, rect.top // CHUNK_SIZE)
+        last_row = min(self.rows - 1, (rect.bottom - 1) // CHUNK_SIZE)
+        return {(col, row) for col in range(first_col, last_col + 1) for row in range(first_row, last_row + 1)}
+        
+    def stream(self, cameras, keep_clear):
+        # Load chunks near the views, drop ones well outside them (the gap avoids thrashing on edges)
+        wanted = set()
+        kept = set()
+        for camera in cameras:
+            view = camera.get_rect()
+            wanted |= self.keys_in(view.inflate(CHUNK_SIZE, CHUNK_SIZE))
+            kept |= self.keys_in(view.inflate(CHUNK_SIZE * 3, CHUNK_SIZE * 3))
+        loaded = [self.generate(key, keep_clear) for key in wanted if key not in self.chunks]
+        dropped = [self.chunks.pop(key) for key in list(self.chunks) if key not in kept]
+        return loaded, dropped
+        
+    def generate(self, key, keep_clear):
+        col, row = key
+        # Seeded per chunk so a chunk looks the same every time it streams back in
+        rng = random.Random(hash((self.seed, col, row)))
+        area = pygame.Rect(col * CHUNK_SIZE, row * CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+        inner = area.clip(pygame.Rect(BORDER_THICKNESS, BORDER_THICKNESS,
+                                      self.cols * CHUNK_SIZE - 2 * BORDER_THICKNESS,
+                                      self.rows * CHUNK_SIZE - 2 * BORDER_THICKNESS))
+        chunk = Chunk(key, area)
+        placed_rects = list(keep_clear)
+        
+        shapes = ["rectangle", "circle", "triangle", "brick"]
+        for _ in range(round(self.world_config["obstacle_count"] * self.density)):
+            width = rng.randint(50, 100)
+            height = rng.randint(50, 100)
+            x = rng.randint(inner.left, inner.right - width)
+            y = rng.randint(inner.top, inner.bottom - height)
+            rect = pygame.Rect(x, y, width, height)
+            if rects_overlap(rect, placed_rects):
+                continue
+            chunk.obstacles.append(Obstacle(x, y, width, height, rng.choice(shapes)))
+            placed_rects.append(rect)
+            
+        enemy_colors = [RED, ORANGE, PURPLE, YELLOW, (255, 0, 255)]
+        for i in range(round(self.world_config["enemy_count"] * self.density)):
+            x = rng.randint(inner.left + 30, inner.right - 30)
+            y = rng.randint(inner.top + 30, inner.bottom - 30)
+            if any(circle_rect_overlap(x, y, 20, rect) for rect in placed_rects):
+                continue
+            color = enemy_colors[i % len(enemy_colors)]
+            chunk.enemies.append(Enemy(x, y, self.world_config["enemy_speed"], color))
+            
+        for element_type in self.world_config["bg_elements"]:
+            for _ in range(round(BG_ELEMENTS[element_type].count * self.density)):
+                x = rng.randint(area.left, area.right)
+                y = rng.randint(area.top, area.bottom)
+                chunk.background_elements.append(BackgroundElement(x, y, element_type, area))
+                
+        self.chunks[key] = chunk
+        return chunk
+
+class TimerWheel:
+    """Hashed timer wheel advanced once per simulation tick.
+
+    Timers name their handler instead of holding a callback, so the pending
+    timers can be saved, snapshotted and restored exactly.
+    """
+    HEADER = struct.Struct("<iiB")
+    RECORD = struct.Struct("<iiBb")
+    
+    def __init__(self, slot_count=TIMER_WHEEL_SLOTS):
+        self.slots = [[] for _ in range(slot_count)]
+        self.tick = 0
+        self.next_id = 1
+        self.timers = {}  # id -> (due tick, handler name, argument)
+        
+    def schedule(self, delay, name, arg=None):
+        timer_id = self.next_id
+        self.next_id += 1
+        self.add(timer_id, self.tick + max(1, int(delay)), name, arg)
+        return timer_id
+        
+    def add(self, timer_id, due, name, arg):
+        self.timers[timer_id] = (due, name, arg)
+        slot = self.slots[due % len(self.slots)]
+        if timer_id not in slot:
+            slot.append(timer_id)
+            
+    def cancel(self, timer_id):
+        # The id stays in its slot and is dropped when that slot comes round
+        self.timers.pop(timer_id, None)
+        
+    def remaining(self, timer_id):
+        timer = self.timers.get(timer_id)
+        return timer[0] - self.tick if timer else 0
+        
+    def advance(self, handlers):
+        self.tick += 1
+        index = self.tick % len(self.slots)
+        slot = self.slots[index]
+        if not slot:
+            return
+            
+        pending = []
+        expired = []
+        for timer_id in slot:
+            timer = self.timers.get(timer_id)
+            if timer is None or timer[0] % len(self.slots) != index:
+                continue  # Cancelled, or moved to another slot by a restore
+            if timer[0] <= self.tick:
+                expired.append(timer_id)
+            else:
+                pending.append(timer_id)  # Due on a later turn of the wheel
+        self.slots[index] = pending
+        
+        for timer_id in expired:
+            timer = self.timers.pop(timer_id, None)
+            if timer is not None:
+                handlers[timer[1]](timer[2])
+                
+    def to_dict(self):
+        return {
+            "tick": self.tick,
+            "next_id": self.next_id,
+            "timers": [[timer_id, due, name, arg] for timer_id, (due, name, arg) in self.timers.items()]
+        }
+        
+    @classmethod
+    def from_dict(cls, data):
+        wheel = cls()
+        wheel.tick = data["tick"]
+        wheel.next_id = data["next_id"]
+        for timer_id, due, name, arg in data["timers"]:
+            wheel.add(timer_id, due, name, arg)
+        return wheel
+        
+    def pack_into(self, buffer, offset):
+        self.HEADER.pack_into(buffer, offset, self.tick, self.next_id, len(self.timers))
+        offset += self.HEADER.size
+        for timer_id, (due, name, arg) in self.timers.items():
+            arg_index = POWER_TYPES.index(arg) if arg is not None else -1
+            self.RECORD.pack_into(buffer, offset, timer_id, due, TIMER_NAMES.index(name), arg_index)
+            offset += self.RECORD.size
+        return offset
+        
+    def unpack_from(self, buffer, offset):
+        self.tick, self.next_id, count = self.HEADER.unpack_from(buffer, offset)
+        offset += self.HEADER.size
+        self.timers = {}
+        for _ in range(count):
+            timer_id, due, name_index, arg_index = self.RECORD.unpack_from(buffer, offset)
+            self.add(timer_id, due, TIMER_NAMES[name_index], POWER_TYPES[arg_index] if arg_index >= 0 else None)
+            offset += self.RECORD.size
+        return offset
+
+class SnapshotRing:
+    """Preallocated ring of fixed-size snapshot slots, newest last"""
+    def __init__(self, capacity, slot_size):
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.buffer = bytearray(capacity * slot_size)
+        self.head = 0  # Next slot to write
+        self.count = 0
+        
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        
+    def push(self):
+        # Hand out the next slot offset, overwriting the oldest snapshot when full
+        offset = self.head * self.slot_size
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return offset
+        
+    def pop(self):
+        if self.count == 0:
+            return None
+        self.head = (self.head - 1) % self.capacity
+        self.count -= 1
+        return self.head * self.slot_size
+
+class RecordedKeys:
+    """Stands in for pygame.key.get_pressed() when replaying a recording"""
+    def __init__(self, mask):
+        self.mask = mask
+        
+    def __getitem__(self, key):
+        return key in RECORDED_KEYS and bool(self.mask >> RECORDED_KEYS.index(key) & 1)
+
+class GamepadKeys:
+    """Reads a gamepad's left stick and d-pad as the arrow keys; without one, nothing is pressed"""
+    def __init__(self, joystick):
+        self.joystick = joystick
+        self.pressed = {}
+        
+    def poll(self):
+        if self.joystick is None:
+            return self
+        x = self.joystick.get_axis(0) if self.joystick.get_numaxes() > 1 else 0.0
+        y = self.joystick.get_axis(1) if self.joystick.get_numaxes() > 1 else 0.0
+        hat_x, hat_y = self.joystick.get_hat(0) if self.joystick.get_numhats() else (0, 0)
+        self.pressed = {
+            pygame.K_LEFT: x < -GAMEPAD_DEAD_ZONE or hat_x < 0,
+            pygame.K_RIGHT: x > GAMEPAD_DEAD_ZONE or hat_x > 0,
+            pygame.K_UP: y < -GAMEPAD_DEAD_ZONE or hat_y > 0,
+            pygame.K_DOWN: y > GAMEPAD_DEAD_ZONE or hat_y < 0
+        }
+        return self
+        
+    def __getitem__(self, key):
+        return self.pressed.get(key, False)
+
+class Recording:
+    """Seed, starting level and per-tick keys of one run.
+    
+    A run is deterministic given these, so replaying it re-simulates every
+    frame exactly. Recording stops when the level is won or lost.
+    """
+    HEADER = struct.Struct("<4sBIHhi")  # magic, version, seed, world index, lives, score
+    MAGIC = b"BREC"
+    VERSION = 1
+    
+    def __init__(self, path, seed, world_index, lives, score):
+        self.path = path
+        self.seed = seed
+        self.world_index = world_index
+        self.lives = lives
+        self.score = score
+        self.inputs = array.array("H")
+        
+    def __len__(self):
+        return len(self.inputs)
+        
+    def begin(self, game):
+        game.begin_seeded(self.seed, self.world_index)
+        game.lives = self.lives
+        game.score = self.score
+        game.state = "PLAYING"
+        
+    def record(self, keys):
+        mask = 0
+        for bit, key in enumerate(RECORDED_KEYS):
+            if keys[key]:
+                mask |= 1 << bit
+        self.inputs.append(mask)
+        
+    def keys(self, tick):
+        return RecordedKeys(self.inputs[tick])
+        
+    def save(self):
+        with open(self.path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, self.world_index, self.lives, self.score))
+            f.write(self.inputs.tobytes())
+            
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, world_index, lives, score = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a version {cls.VERSION} recording")
+        recording = cls(path, seed, world_index, lives, score)
+        recording.inputs.frombytes(data[cls.HEADER.size:])
+        return recording
+
+class TrajectoryWriter:
+    """Per-tick observations written straight into a memory-mapped file.
+    
+    Every row has the same layout, a TICK record followed by
+    TRAJECTORY_MAX_ENEMIES ENEMY slots, so read_trajectory can map the file
+    back as a numpy structured array. Recording a tick packs into the map in
+    place; nothing is built per tick. episodes.bin lists the first row and
+    world of each level played.
+    """
+    MAGIC = b"BTRJ"
+    VERSION = 1
+    HEADER = struct.Struct("<4sQBHH")  # magic, rows written, version, row size, enemy slots
+    ROWS = struct.Struct("<Q")
+    TICK = struct.Struct("<IIffBifffBBH")
+    ENEMY = struct.Struct("<ffB")  # x, y, flags (1 frozen, 2 enraged)
+    EPISODE = struct.Struct("<QB")  # first row, world index
+    ROW_SIZE = TICK.size + TRAJECTORY_MAX_ENEMIES * ENEMY.size
+    
+    def __init__(self, directory, capacity=TRAJECTORY_CAPACITY):
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(os.path.join(directory, "ticks.bin"), "w+b")
+        self.episodes = open(os.path.join(directory, "episodes.bin"), "wb")
+        self.rows = 0
+        self.episode = -1
+        self.data = None
+        self.map(capacity)
+        
+    def map(self, capacity):
+        if self.data is not None:
+            self.data.close()
+        self.capacity = capacity
+        # Truncating up leaves a sparse file, so unused rows take no disk space
+        self.file.truncate(self.HEADER.size + capacity * self.ROW_SIZE)
+        self.data = mmap.mmap(self.file.fileno(), 0)
+        self.HEADER.pack_into(self.data, 0, self.MAGIC, self.rows, self.VERSION,
+                              self.ROW_SIZE, TRAJECTORY_MAX_ENEMIES)
+        
+    def begin_episode(self, world_index):
+        self.episode += 1
+        self.episodes.write(self.EPISODE.pack(self.rows, world_index))
+        self.episodes.flush()
+        
+    def record(self, game):
+        if self.rows == self.capacity:
+            self.map(self.capacity * 2)
+        data = self.data
+        offset = self.HEADER.size + self.rows * self.ROW_SIZE
+        player = game.player
+        portal = game.portal
+        powers = 0
+        for bit, power_type in enumerate(POWER_TYPES):
+            if power_type in game.active_powers:
+                powers |= 1 << bit
+        enemies = game.enemies
+        self.TICK.pack_into(data, offset, game.ticks, self.episode, player.x, player.y, game.lives, game.score,
+                            game.time_remaining, portal.x, portal.y, portal.visible, powers, len(enemies))
+        offset += self.TICK.size
+        pack_enemy = self.ENEMY.pack_into
+        for i in range(min(len(enemies), TRAJECTORY_MAX_ENEMIES)):
+            enemy = enemies[i]
+            pack_enemy(data, offset, enemy.x, enemy.y, enemy.frozen | enemy.enraged << 1)
+            offset += self.ENEMY.size
+        self.rows += 1
+        # The row count goes last, so a reader never sees a half-written row
+        self.ROWS.pack_into(data, 4, self.rows)
+        
+    def close(self):
+        self.data.close()
+        self.file.truncate(self.HEADER.size + self.rows * self.ROW_SIZE)
+        self.file.close()
+        self.episodes.close()
+
+def trajectory_dtype(enemy_slots=TRAJECTORY_MAX_ENEMIES):
+    # numpy view of a TrajectoryWriter row, field for field
+    enemy = np.dtype([("x", "<f4"), ("y", "<f4"), ("flags", "u1")])
+    return np.dtype([
+        ("tick", "<u4"), ("episode", "<u4"), ("player", "<f4", (2,)), ("lives", "u1"), ("score", "<i4"),
+        ("time_remaining", "<f4"), ("portal", "<f4", (2,)), ("portal_visible", "u1"), ("powers", "u1"),
+        ("enemy_count", "<u2"), ("enemies", enemy, (enemy_slots,))])
+
+def read_trajectory(directory):
+    """Map a recorded trajectory as (rows, episodes); slicing rows only reads what it touches"""
+    if np is None:
+        raise RuntimeError("Reading trajectories needs numpy")
+    path = os.path.join(directory, "ticks.bin")
+    with open(path, "rb") as f:
+        header = f.read(TrajectoryWriter.HEADER.size)
+    magic, rows, version, row_size, enemy_slots = TrajectoryWriter.HEADER.unpack(header)
+    dtype = trajectory_dtype(enemy_slots)
+    if magic != TrajectoryWriter.MAGIC or version != TrajectoryWriter.VERSION or dtype.itemsize != row_size:
+        raise ValueError(f"{path} is not a version {TrajectoryWriter.VERSION} trajectory")
+    if rows:
+        ticks = np.memmap(path, dtype=dtype, mode="r", offset=TrajectoryWriter.HEADER.size, shape=(rows,))
+    else:
+        ticks = np.zeros(0, dtype)
+    episodes = np.fromfile(os.path.join(directory, "episodes.bin"), dtype=[("first_row", "<u8"), ("world", "u1")])
+    return ticks, episodes
+
+class GhostRun:
+    """A finished run's player path, quantized and delta-coded in blocks decoded on demand.
+    
+    Each GHOST_BLOCK-tick block starts with an absolute position followed by
+    one signed byte per axis per tick; a block with a larger jump (a respawn)
+    is stored as absolute positions instead.
+    """
+    KEY = struct.Struct("<BHH")  # raw flag, x, y
+    DELTA = struct.Struct("<bb")
+    ABSOLUTE = struct.Struct("<HH")
+    
+    def __init__(self, name, ticks, offsets, data):
+        self.name = name
+        self.ticks = ticks
+        self.offsets = offsets
+        self.data = data
+        self.block = -1
+        self.positions = []
+        
+    @classmethod
+    def encode(cls, name, path):
+        # path holds quantized x, y pairs, one per tick
+        ticks = len(path) // 2
+        offsets = array.array("I")
+        data = bytearray()
+        for start in range(0, ticks, GHOST_BLOCK):
+            offsets.append(len(data))
+            end = min(start + GHOST_BLOCK, ticks)
+            deltas = [(path[2 * t] - path[2 * t - 2], path[2 * t + 1] - path[2 * t - 1]) for t in range(start + 1, end)]
+            raw = any(not (-128 <= dx <= 127 and -128 <= dy <= 127) for dx, dy in deltas)
+            data += cls.KEY.pack(raw, path[2 * start], path[2 * start + 1])
+            for t, (dx, dy) in enumerate(deltas, start + 1):
+                data += cls.ABSOLUTE.pack(path[2 * t], path[2 * t + 1]) if raw else cls.DELTA.pack(dx, dy)
+        return cls(name, ticks, offsets, bytes(data))
+        
+    def decode(self, block):
+        offset = self.offsets[block]
+        raw, x, y = self.KEY.unpack_from(self.data, offset)
+        offset += self.KEY.size
+        positions = [(x / GHOST_SCALE, y / GHOST_SCALE)]
+        step = self.ABSOLUTE if raw else self.DELTA
+        for _ in range(min(GHOST_BLOCK, self.ticks - block * GHOST_BLOCK) - 1):
+            a, b = step.unpack_from(self.data, offset)
+            offset += step.size
+            x, y = (a, b) if raw else (x + a, y + b)
+            positions.append((x / GHOST_SCALE, y / GHOST_SCALE))
+        self.block = block
+        self.positions = positions
+        
+    def position(self, tick):
+        # Only the current block is kept decoded; a race reads them in order
+        block = tick // GHOST_BLOCK
+        if block != self.block:
+            self.decode(block)
+        return self.positions[tick % GHOST_BLOCK]
+
+class GhostBoard:
+    """The fastest GHOST_LIMIT runs through one seeded course, kept in one file"""
+    MAGIC = b"BGHO"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBIBH")  # magic, version, seed, world index, run count
+    RUN = struct.Struct("<16sIII")  # name, ticks to finish, block count, data length
+    
+    def __init__(self, seed, world_index, directory=GHOST_DIR):
+        self.seed = seed
+        self.world_index = world_index
+        self.path = os.path.join(directory, f"{world_index}-{seed}.bin")
+        self.runs = []
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        magic, version, seed, world_index, count = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION or (seed, world_index) != (self.seed, self.world_index):
+            raise ValueError(f"{self.path} is not a version {self.VERSION} ghost file for this course")
+        offset = self.HEADER.size
+        for _ in range(count):
+            name, ticks, blocks, length = self.RUN.unpack_from(data, offset)
+            offset += self.RUN.size
+            offsets = array.array("I")
+            offsets.frombytes(data[offset:offset + blocks * offsets.itemsize])
+            offset += blocks * offsets.itemsize
+            self.runs.append(GhostRun(name.rstrip(b"\0").decode("utf-8", "replace"), ticks, offsets,
+                                      data[offset:offset + length]))
+            offset += length
+            
+    def add(self, run):
+        self.runs.append(run)
+        self.runs.sort(key=lambda r: r.ticks)
+        del self.runs[GHOST_LIMIT:]
+        return run in self.runs
+        
+    def save(self):
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, self.world_index, len(self.runs)))
+        for run in self.runs:
+            data += self.RUN.pack(run.name.encode("utf-8")[:16], run.ticks, len(run.offsets), len(run.data))
+            data += run.offsets.tobytes()
+            data += run.data
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+class Race:
+    """A run through a seeded course against the ghosts of earlier runs on it"""
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+        self.tick = 0
+        self.path = array.array("H")
+        # The player's own best gets its own colour
+        own = [run for run in board.runs if run.name == name]
+        self.best = own[0] if own else None
+        
+    def record(self, game):
+        self.path.append(int(game.player.x * GHOST_SCALE))
+        self.path.append(int(game.player.y * GHOST_SCALE))
+        self.tick += 1
+        
+    def finish(self):
+        run = GhostRun.encode(self.name, self.path)
+        placed = self.board.add(run)
+        if placed:
+            self.board.save()
+        return placed
+        
+    def ghosts(self, sees):
+        ghosts = []
+        for run in self.board.runs:
+            if self.tick < run.ticks:
+                x, y = run.position(self.tick)
+                if sees(x, y, 30):
+                    ghosts.append((x, y, run is self.best))
+        return tuple(ghosts)
+
+class FrameSnapshot(namedtuple("FrameSnapshot", (
+        "surface", "camera", "bg_color", "arena_size", "spawn_platform", "obstacles", "obstacle_layer",
+        "background_elements", "power_ups", "portal", "enemies", "players",
+        "state", "world_name", "next_world", "lives", "time_remaining", "score", "best_score", "vision", "paused", "ghosts"))):
+    """Immutable copy of what one frame draws: per-entity tuples of draw fields plus HUD values.
+    
+    Only entities inside the viewport are captured. The render thread never
+    touches the live game, so it can draw frame N while update builds N+1.
+    Split screen captures one snapshot per viewport; the first carries the HUD.
+    """
+    __slots__ = ()
+    
+    @classmethod
+    def capture(cls, game, view=0):
+        camera = game.cameras[view]
+        sees = camera.sees
+        # The entity lists are culled against these directly: a call to sees per entity costs more than
+        # the test itself, and split screen runs every list once per viewport
+        left, top = camera.x, camera.y
+        right, bottom = left + camera.width, top + camera.height
+        portal = game.portal
+        layer = game.obstacle_layer()
+        return cls(
+            game.view_surfaces[view],
+            copy.copy(camera),
+            game.world_config["bg_color"],
+            (game.arena_width, game.arena_height),
+            game.spawn_platform.frame_state(),
+            tuple(o.frame_state() for o in game.obstacles
+                  if left - 100 < o.x < right + 100 and top - 100 < o.y < bottom + 100) if layer is None else (),
+            layer,
+            tuple(e.frame_state() for e in game.background_elements
+                  if left - e.size - 100 < e.x < right + e.size + 100
+                  and top - e.size - 100 < e.y < bottom + e.size + 100),
+            tuple(p.frame_state() for p in game.power_ups
+                  if left - p.radius - 10 < p.x < right + p.radius + 10
+                  and top - p.radius - 10 < p.y < bottom + p.radius + 10),
+            portal.frame_state() if sees(portal.x, portal.y, portal.radius + 40) else None,
+            tuple((e.render, e.frame_state()) for e in game.enemies
+                  if left - e.radius - 10 < e.x < right + e.radius + 10
+                  and top - e.radius - 10 < e.y < bottom + e.radius + 10),
+            tuple(p.frame_state() for p in game.players if sees(p.x, p.y, p.radius + 100)),
+            game.state,
+            game.current_world,
+            game.worlds_list[(game.current_world_index + 1) % len(game.worlds_list)],
+            game.lives,
+            game.time_remaining,
+            game.score,
+            game.best_score,
+            game.vision_overlay(camera) if game.show_vision else (),
+            game.paused,
+            game.race.ghosts(sees) if game.race is not None else ())
+
+class RenderThread(threading.Thread):
+    """Draws frame snapshots handed over by the main thread.
+    
+    At most two snapshots are alive: the one being drawn and the one the
+    simulation is building. The main thread keeps pumping events and calls
+    display.flip itself, since SDL wants both on the thread that made the window.
+    """
+    def __init__(self, game):
+        super().__init__(daemon=True)
+        self.game = game
+        self.frames = queue.Queue(maxsize=1)
+        self.done = queue.Queue(maxsize=1)
+        self.pending = False
+        
+    def run(self):
+        while True:
+            frames = self.frames.get()
+            if frames is None:
+                return
+            self.game.render_views(frames)
+            self.done.put(frames)
+            
+    def submit(self, frames):
+        # Wait for the previous frame, present it, then start drawing the next (one snapshot per viewport)
+        self.wait()
+        self.frames.put(frames)
+        self.pending = True
+        
+    def wait(self):
+        if self.pending:
+            self.done.get()
+            self.pending = False
+            pygame.display.flip()
+            
+    def stop(self):
+        self.wait()
+        self.frames.put(None)
+        self.join()
+
+def write_save(path, save_data):
+    # Written beside the old file and swapped in, so a crash leaves one or the other intact
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(save_data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Journal(threading.Thread):
+    """Append-only log of progress events since the last save, written in batches.
+    
+    The game thread only packs a record and queues it. Each save is a
+    checkpoint with a generation number; the journal header names the
+    generation it follows, so a journal left over from an older save is ignored.
+    """
+    MAGIC = b"BJNL"
+    HEADER = struct.Struct("<4sI")
+    RECORD = struct.Struct("<IBi")  # tick, event, value
+    RESET, LEVEL, LIVES, SCORE, POWER_UP = range(5)
+    IDLE = "idle"
+    
+    def __init__(self, path, save_path, generation):
+        super().__init__(daemon=True)
+        self.path = path
+        self.save_path = save_path
+        self.queue = queue.Queue()
+        self.logged = 0
+        # Keep the events already there if they follow the current save, minus any torn record
+        try:
+            with open(path, "rb") as f:
+                length = self.valid_length(f.read(), generation)
+        except OSError:
+            length = 0
+        if length:
+            self.log = open(path, "r+b")
+            self.log.truncate(length)
+            self.log.seek(length)
+        else:
+            self.log = open(path, "wb")
+            self.log.write(self.HEADER.pack(self.MAGIC, generation))
+            
+    @classmethod
+    def valid_length(cls, data, generation):
+        if len(data) < cls.HEADER.size or cls.HEADER.unpack_from(data) != (cls.MAGIC, generation):
+            return 0
+        records = (len(data) - cls.HEADER.size) // cls.RECORD.size
+        return cls.HEADER.size + records * cls.RECORD.size
+        
+    @classmethod
+    def read(cls, path, generation):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return []
+        length = cls.valid_length(data, generation)
+        return list(cls.RECORD.iter_unpack(data[cls.HEADER.size:length])) if length else []
+        
+    def log_event(self, tick, event, value):
+        self.queue.put(self.RECORD.pack(tick, event, value))
+        self.logged += 1
+        
+    def checkpoint(self, save_data):
+        # Events queued before this are part of the save; the writer starts a fresh journal after it
+        self.queue.put(save_data)
+        self.logged = 0
+        
+    def close(self):
+        self.queue.put(None)
+        self.join()
+        
+    def run(self):
+        while True:
+            item = self.queue.get()
+            records = []
+            deadline = time.monotonic() + JOURNAL_BATCH_SECONDS
+            while isinstance(item, bytes):
+                records.append(item)
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = self.IDLE
+            # A failed write is reported and the thread carries on, so later events still get logged
+            if records:
+                try:
+                    self.log.write(b"".join(records))
+                    self.sync()
+                except OSError as e:
+                    print(f"Journal write failed: {e}")
+            if item is None:
+                self.log.close()
+                return
+            if isinstance(item, dict):
+                try:
+                    write_save(self.save_path, item)
+                except (OSError, ValueError, TypeError) as e:
+                    # The old journal stays, still matching the last save that was written
+                    print(f"Save failed: {e}")
+                    continue
+                try:
+                    self.log.seek(0)
+                    self.log.truncate()
+                    self.log.write(self.HEADER.pack(self.MAGIC, item["journal_generation"]))
+                    self.sync()
+                except OSError as e:
+                    print(f"Journal write failed: {e}")
+                
+    def sync(self):
+        self.log.flush()
+        os.fsync(self.log.fileno())
+
+def to_samples(values, volume):
+    # Mono floats in -1..1 to 16-bit samples in the mixer's format; channels are filled by strided copies
+    channels = pygame.mixer.get_init()[2]
+    mono = array.array("h", [int(v * volume * 32767) for v in values])
+    samples = array.array("h", bytes(len(mono) * channels * mono.itemsize))
+    for channel in range(channels):
+        samples[channel::channels] = mono
+    return samples.tobytes()
+
+def cached_sound(synthesize, *args):
+    # Synthesis takes a noticeable part of a second, so the samples are kept in the asset cache between runs
+    rate, _, channels = pygame.mixer.get_init()
+    key = AssetCache.key("sound", synthesize.__name__, rate, channels, args)
+    samples = ASSETS.load_samples(key)
+    if samples is None:
+        samples = synthesize(*args)
+        ASSETS.store_samples(key, samples)
+    return pygame.mixer.Sound(buffer=samples)
+
+def synthesize_effect(waveform, segments, volume=0.4):
+    rate = pygame.mixer.get_init()[0]
+    ramp = rate // 200  # 5 ms fades so the edges don't click
+    values = []
+    phase = 0.0
+    for start, end, seconds in segments:
+        count = int(rate * seconds)
+        for i in range(count):
+            # Swept pitch through a running phase, so the waveform stays continuous
+            phase = (phase + (start + (end - start) * i / count) / rate) % 1.0
+            if waveform == "sine":
+                value = math.sin(2 * math.pi * phase)
+            elif waveform == "square":
+                value = 0.5 if phase < 0.5 else -0.5
+            else:
+                value = 2 * phase - 1
+            values.append(value * min(1.0, i / ramp, (count - i) / ramp))
+    return to_samples(values, volume)
+
+def synthesize_ambient(tone, seconds=AMBIENT_SECONDS):
+    # A drone with one slow swell; whole cycles of both, so the loop has no seam
+    rate = pygame.mixer.get_init()[0]
+    tone = max(1, round(tone * seconds)) / seconds
+    count = rate * seconds
+    values = ((math.sin(2 * math.pi * tone * i / rate) * 0.7 + math.sin(4 * math.pi * tone * i / rate) * 0.2)
+              * (0.6 + 0.4 * math.sin(2 * math.pi * i / count)) for i in range(count))
+    return to_samples(values, AMBIENT_VOLUME)
+
+# Synthesized sounds, kept for the life of the process
+SOUNDS = {}
+
+class Audio:
+    """Sound effects and ambient loops, played through a fixed pool of mixer channels.
+    
+    Samples are synthesized once, or read back from the asset cache, into SOUNDS,
+    so playing one is a channel lookup and a call into SDL_mixer, which mixes on
+    its own thread. Without an audio device (or with --mute) every call is a no-op.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = False
+        self.ambient_tone = None
+        if not enabled:
+            return
+        try:
+            if pygame.mixer.get_init() != (AUDIO_FREQUENCY, -16, 2):
+                pygame.mixer.quit()
+                pygame.mixer.init(AUDIO_FREQUENCY, -16, 2, AUDIO_BUFFER)
+        except pygame.error as e:
+            print(f"Sound disabled: {e}")
+            return
+        self.enabled = True
+        pygame.mixer.set_num_channels(AUDIO_VOICES + 1)
+        pygame.mixer.set_reserved(1)
+        self.ambient_channel = pygame.mixer.Channel(0)
+        self.voices = [pygame.mixer.Channel(i + 1) for i in range(AUDIO_VOICES)]
+        # Priority and start order of what each voice last played
+        self.priorities = [0] * AUDIO_VOICES
+        self.started = [0] * AUDIO_VOICES
+        self.plays = 0
+        for name, (_, waveform, segments) in SOUND_EFFECTS.items():
+            if name not in SOUNDS:
+                SOUNDS[name] = cached_sound(synthesize_effect, waveform, segments)
+                
+    def play(self, name):
+        if not self.enabled:
+            return None
+        priority = SOUND_EFFECTS[name][0]
+        voice = None
+        for i, channel in enumerate(self.voices):
+            if not channel.get_busy():
+                voice = i
+                break
+            # Otherwise steal the oldest voice playing something no more important
+            if self.priorities[i] <= priority and (voice is None or self.started[i] < self.started[voice]):
+                voice = i
+        if voice is None:
+            return None
+        self.plays += 1
+        self.priorities[voice] = priority
+        self.started[voice] = self.plays
+        self.voices[voice].play(SOUNDS[name])
+        return voice
+        
+    def ambient(self, tone):
+        # Loops the world's drone, fading between worlds
+        if not self.enabled or tone == self.ambient_tone:
+            return
+        self.ambient_tone = tone
+        if not tone:
+            self.ambient_channel.fadeout(500)
+            return
+        self.ambient_channel.play(self.ambient_sound(tone), loops=-1, fade_ms=500)
+        
+    def ambient_sound(self, tone):
+        # Synthesized when a world with this pitch is first entered
+        key = ("ambient", tone)
+        if tone and key not in SOUNDS:
+            SOUNDS[key] = cached_sound(synthesize_ambient, tone)
+        return SOUNDS.get(key)
+        
+class Plugin:
+    """Base class for plugins, which override only the hooks they need.
+        
+    on_level_load(game) runs after a level is built, on_tick(game, dt) after the
+    built-in entities move (dt covers any ticks it was throttled through),
+    on_collision(game, player, other) when a player touches an enemy, a power-up
+    or the portal, and on_draw(game, frame) after each viewport's world is drawn.
+    on_draw may run on the render thread: it should only read the game and draw
+    into frame.surface through frame.camera.
+    """
+    name = "plugin"
+        
+    def on_level_load(self, game):
+        pass
+        
+    def on_tick(self, game, dt):
+        pass
+        
+    def on_collision(self, game, player, other):
+        pass
+        
+    def on_draw(self, game, frame):
+        pass
+
+class PluginHook:
+    """One plugin's override of one hook, with the running cost of its calls"""
+    __slots__ = ("call", "name", "cost", "interval", "wait", "dt", "flagged")
+        
+    def __init__(self, plugin, hook):
+        self.call = getattr(plugin, hook)  # Bound once, not looked up per call
+        self.name = f"{plugin.name}.{hook}"
+        self.cost = 0.0  # Milliseconds per call, smoothed
+        self.interval = 1  # Frames between calls; doubled while over budget
+        self.wait = 0
+        self.dt = 0  # Ticks since on_tick last ran
+        self.flagged = False
+
+class Plugins:
+    """The loaded plugins, with a list of hooks per hook name built as each plugin is added.
+        
+    A list only holds the hooks a plugin overrides, so dispatch is a loop over it.
+    Every call is timed against an equal share of PLUGIN_BUDGET_MS. A hook over its
+    share is reported once; on_tick and on_draw are then run every 2nd, 4th, ... frame
+    until they fit, while level loads and collisions are never skipped.
+    """
+    def __init__(self, budget_ms=PLUGIN_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.share_ms = budget_ms
+        self.plugins = []
+        self.level_loads = []
+        self.ticks = []
+        self.collisions = []
+        self.draws = []
+        
+    def add(self, plugin):
+        self.plugins.append(plugin)
+        for hook, hooks in zip(PLUGIN_HOOKS, (self.level_loads, self.ticks, self.collisions, self.draws)):
+            if getattr(type(plugin), hook) is not getattr(Plugin, hook):
+                hooks.append(PluginHook(plugin, hook))
+        self.share_ms = self.budget_ms / max(1, len(self.ticks) + len(self.draws))
+        
+    def level_load(self, game):
+        clock = time.perf_counter
+        for hook in self.level_loads:
+            start = clock()
+            hook.call(game)
+            self.charge(hook, clock() - start, False)
+        
+    def tick(self, game, dt):
+        clock = time.perf_counter
+        for hook in self.ticks:
+            hook.dt += dt
+            hook.wait -= 1
+            if hook.wait > 0:
+                continue
+            start = clock()
+            hook.call(game, hook.dt)
+            hook.dt = 0
+            self.charge(hook, clock() - start, True)
+        
+    def collision(self, game, player, other):
+        clock = time.perf_counter
+        for hook in self.collisions:
+            start = clock()
+            hook.call(game, player, other)
+            self.charge(hook, clock() - start, False)
+        
+    def draw(self, game, frame):
+        clock = time.perf_counter
+        for hook in self.draws:
+            hook.wait -= 1
+            if hook.wait > 0:
+                continue
+            start = clock()
+            hook.call(game, frame)
+            self.charge(hook, clock() - start, True)
+        
+    def charge(self, hook, seconds, throttle):
+        hook.cost += (seconds * 1000 - hook.cost) * PLUGIN_COST_SMOOTHING
+        per_frame = hook.cost / hook.interval
+        if per_frame > self.share_ms:
+            if not hook.flagged:
+                hook.flagged = True
+                print(f"Plugin hook {hook.name} takes {hook.cost:.2f} ms, over its {self.share_ms:.2f} ms share"
+                      + ("; running it less often" if throttle else ""))
+            if throttle:
+                hook.interval = min(hook.interval * 2, PLUGIN_MAX_INTERVAL)
+        elif hook.interval > 1 and per_frame * 4 < self.share_ms:
+            # Well under budget again: halving the interval still leaves room
+            hook.interval //= 2
+        hook.wait = hook.interval
+
+PLUGINS = Plugins()
+
+def register_plugin(plugin):
+    PLUGINS.add(plugin)
+
+def load_plugins(path):
+    # A plugin file, or every .py file in a directory, each defining register(game) which gets this
+    # module and calls register_plugin, register_bg_element, register_power_up or register_enemy_type
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".py")]
+    else:
+        files = [path]
+    for file in files:
+        name = "ball_escape_plugin_" + os.path.splitext(os.path.basename(file))[0]
+        spec = importlib.util.spec_from_file_location(name, file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.register(sys.modules[__name__])
+
 class Game:
-    def __init__(self):
+    # Header of a rewind snapshot, followed by the enemy and power-up records
+    SNAPSHOT = struct.Struct("<Biiiiiiiiddd??dHB")
+    SNAPSHOT_SIZE = (SNAPSHOT.size + SNAPSHOT_MAX_ENEMIES * Enemy.SNAPSHOT.size
+                     + SNAPSHOT_MAX_POWER_UPS * PowerUp.SNAPSHOT.size
+                     + TimerWheel.HEADER.size + SNAPSHOT_MAX_TIMERS * TimerWheel.RECORD.size)
+    
+    def __init__(self, open_world=False, render_scale=1.0, players=1, sound=True):
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Ball Escape Adventure")
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 36)
-        self.small_font = pygame.font.SysFont('Arial', 24)
+        self.font = load_font(36)
+        self.small_font = load_font(24)
         self.state = "PLAYING"
+        # Simulated ticks; the level timer runs off these, not the wall clock
+        self.ticks = 0
+        self.recording = None
+        self.trajectory = None
+        self.race = None
+        # Static screens and an unfocused window wait on events instead of redrawing at FPS
+        self.idle_mode = True
+        self.paused = False
+        self.needs_redraw = False
+        self.ticks_to_reload_check = HOT_RELOAD_INTERVAL
+        self.ai_lod = True
+        self.journal = None
+        self.journal_generation = 0
+        self.crowd_grid = SpatialHash(CROWD_RADIUS)
+        self.vision_grid = None
+        self.show_vision = False
+        # Obstacles of a fixed-size level baked into one layer: (obstacle list, count, scale, surface)
+        self.baked_obstacles = None
+        self.audio = Audio(sound)
+        self.plugins = PLUGINS
+        # Rendered HUD text, shared by every frame and viewport
+        self.text_cache = {}
+        self.player_count = players
+        self.gamepads = [None] * players
+        if players > len(PLAYER_CONTROLS):
+            pygame.joystick.init()
+            for i in range(len(PLAYER_CONTROLS), players):
+                pad = i - len(PLAYER_CONTROLS)
+                if pad < pygame.joystick.get_count():
+                    self.gamepads[i] = GamepadKeys(pygame.joystick.Joystick(pad))
+                else:
+                    print(f"No gamepad for player {i + 1}; they will stand still")
+                    self.gamepads[i] = GamepadKeys(None)
         self.exit_button = Button(SCREEN_WIDTH - 100, 20, 80, 30, "Exit")
         self.best_score = self.load_best_score()
+        self.rewind = SnapshotRing(REWIND_SECONDS * FPS, self.SNAPSHOT_SIZE)
         
-        if os.path.exists(SAVE_FILE):
-            if not self.load_game():
-                self.reset_game()
+        # Open-world mode streams a much larger arena in chunks around the camera
+        self.open_world = open_world
+        if open_world:
+            self.arena_width = self.arena_height = OPEN_WORLD_SIZE
         else:
-            self.reset_game()
+            self.arena_width, self.arena_height = SCREEN_WIDTH, SCREEN_HEIGHT
+        self.layout_views()
+        self.set_render_scale(render_scale)
+        self.chunk_world = None
+        self.timer_handlers = {
+            "power_expired": self.on_power_expired,
+            "portal_toggle": self.on_portal_toggle,
+            "spawn_power_up": self.on_spawn_power_up
+        }
+        
+        self.reset_game()
+        if not open_world and players == 1:
+            # The save is the last checkpoint; the journal holds the progress made since
+            if os.path.exists(SAVE_FILE) and not self.load_game():
+                self.reset_game()
+            self.replay_journal()
             
     def load_best_score(self):
         if os.path.exists(BEST_SCORE_FILE):
@@ -707,17 +2735,88 @@ class Game:
             with open(BEST_SCORE_FILE, "w") as f:
                 json.dump({"best_score": self.best_score}, f)
                 
+    def now(self):
+        # Milliseconds of simulated time, so dt > 1 steps and replays keep the timer in step
+        return self.ticks * 1000 // FPS
+        
+    def reload_worlds(self):
+        for name in WORLDS.changed():
+            start = time.perf_counter()
+            old_config = WORLDS[name]
+            try:
+                config = WORLDS.load(name)
+            except (OSError, ValueError) as e:
+                print(f"Keeping the previous {name} definition: {e}")
+                continue
+            if name == self.current_world:
+                self.apply_world_config(old_config, config)
+            print(f"Reloaded {name} in {(time.perf_counter() - start) * 1000:.2f} ms")
+            
+    def apply_world_config(self, old, new):
+        # Rebuild only what the edit touched; the player, score, lives and timers carry on
+        self.world_config = new
+        if new["enemy_speed"] != old["enemy_speed"]:
+            for enemy in self.enemies:
+                if old["enemy_speed"]:
+                    enemy.base_speed *= new["enemy_speed"] / old["enemy_speed"]
+                else:
+                    enemy.base_speed = new["enemy_speed"]
+                enemy.speed = 0 if enemy.frozen else enemy.base_speed * (1.5 if enemy.enraged else 1)
+        self.audio.ambient(new["ambient"])
+        self.portal.color = new["portal_color"]
+        self.portal.visible_time = new["portal_visible_time"] * 1000
+        self.portal.hidden_time = new["portal_hidden_time"] * 1000
+        if self.open_world:
+            return
+        if new["bg_elements"] != old["bg_elements"]:
+            self.create_background()
+        if new["obstacle_count"] != old["obstacle_count"] or new.get("layout") != old.get("layout"):
+            self.create_obstacles()
+            
+    def begin_seeded(self, seed, world_index):
+        # Rebuild a level from a seed, so a replay or a race sees exactly the same course
+        random.seed(seed)
+        self.ticks = 0
+        self.reset_game()
+        self.current_world_index = world_index - 1
+        self.next_level()
+        self.state = "PLAYING"
+        
+    def start_race(self, world_index, seed):
+        self.begin_seeded(seed, world_index)
+        try:
+            name = getpass.getuser()
+        except (OSError, KeyError):
+            name = "player"
+        self.race = Race(GhostBoard(seed, world_index), name)
+        
+    def start_recording(self, path):
+        self.recording = Recording(path, random.randrange(2 ** 32), self.current_world_index, self.lives, self.score)
+        self.recording.begin(self)
+        
+    def start_trajectory(self, directory):
+        self.trajectory = TrajectoryWriter(directory)
+        self.trajectory.begin_episode(self.current_world_index)
+        
+    def record_tick(self, keys):
+        if self.state == "PLAYING":
+            self.recording.record(keys)
+        else:
+            self.recording.save()
+            self.recording = None
+            
     def reset_game(self):
         # Create spawn platform first
-        platform_width = 120
-        platform_height = 60
-        platform_x = SCREEN_WIDTH // 2 - platform_width // 2
-        platform_y = SCREEN_HEIGHT // 2 - platform_height // 2
-        self.spawn_platform = SpawnPlatform(platform_x, platform_y, platform_width, platform_height)
+        self.create_spawn_platform()
         
-        # Create player at the center of the platform
-        player_x, player_y = self.spawn_platform.get_center()
-        self.player = Player(player_x, player_y)
+        # Create the players lined up on the platform, player 1 at its center when alone
+        self.players = [Player(*self.spawn_point(i)) for i in range(self.player_count)]
+        if self.player_count > 1:
+            for player, controls, color in zip(self.players, PLAYER_CONTROLS + (ARROW_CONTROLS,) * 2,
+                                               PLAYER_COLORS):
+                player.controls = controls
+                player.color = color
+        self.player = self.players[0]
         
         self.worlds_list = list(WORLDS.keys())
         self.current_world_index = 0
@@ -726,7 +2825,7 @@ class Game:
         self.enemies = []
         self.portal = Portal(self.world_config)
         self.time_remaining = self.world_config["time_limit"]
-        self.level_start_time = pygame.time.get_ticks()
+        self.level_start_time = self.now()
         self.lives = 3
         self.score = 0
         self.background_elements = []
@@ -735,6 +2834,69 @@ class Game:
         self.obstacles = []
         self.portal_cycle_count = 0
         
+        self.create_level()
+        self.audio.ambient(self.world_config["ambient"])
+        
+        # Every timed effect is a timer on the wheel
+        self.timers = TimerWheel()
+        self.portal_timer = self.timers.schedule(self.portal.visible_time * FPS // 1000, "portal_toggle")
+        self.timers.schedule(POWER_UP_INTERVAL, "spawn_power_up")
+        self.rewind.clear()
+        self.log_event(Journal.RESET, 0)
+        if self.trajectory is not None:
+            self.trajectory.begin_episode(self.current_world_index)
+        self.plugins.level_load(self)
+        
+    def create_spawn_platform(self):
+        platform_width = 120
+        platform_height = 60
+        platform_x = self.arena_width // 2 - platform_width // 2
+        platform_y = self.arena_height // 2 - platform_height // 2
+        self.spawn_platform = SpawnPlatform(platform_x, platform_y, platform_width, platform_height)
+        
+    def spawn_point(self, index):
+        x, y = self.spawn_platform.get_center()
+        return x + (2 * index - (self.player_count - 1)) * PLAYER_SPACING // 2, y
+        
+    def respawn(self, player):
+        player.x, player.y = self.spawn_point(self.players.index(player))
+        player.trail = []
+        
+    def nearest_player(self, x, y):
+        return min(self.players, key=lambda player: (player.x - x) ** 2 + (player.y - y) ** 2)
+        
+    def player_distance(self, x, y):
+        return min(math.sqrt((x - player.x) ** 2 + (y - player.y) ** 2) for player in self.players)
+        
+    def in_view(self, x, y, margin):
+        for camera in self.cameras:
+            if camera.sees(x, y, margin):
+                return True
+        return False
+        
+    def spawn_area(self):
+        # Spawns land in view of one of the players
+        if len(self.cameras) == 1:
+            return self.camera.get_rect()
+        return random.choice(self.cameras).get_rect()
+        
+    def create_level(self):
+        if self.open_world:
+            # Portal somewhere in reach but off screen, then stream in the chunks around the player
+            around_spawn = self.spawn_platform.get_rect().inflate(PORTAL_RANGE, PORTAL_RANGE)
+            around_spawn = around_spawn.clip(pygame.Rect(0, 0, self.arena_width, self.arena_height))
+            self.portal.place(around_spawn)
+            while math.hypot(self.portal.x - self.player.x, self.portal.y - self.player.y) < SCREEN_WIDTH:
+                self.portal.place(around_spawn)
+            self.obstacles = []
+            self.enemies = []
+            self.background_elements = []
+            self.chunk_world = ChunkWorld(self.world_config, random.getrandbits(32),
+                                          self.arena_width, self.arena_height)
+            self.follow_players()
+            self.stream_chunks()
+            return
+            
         # Create obstacles first
         self.create_obstacles()
         
@@ -744,9 +2906,36 @@ class Game:
         # Finally create background elements
         self.create_background()
         
-        self.power_up_timer = 0
+    def stream_chunks(self):
+        keep_clear = [
+            self.spawn_platform.get_rect().inflate(100, 100),
+            self.portal.get_rect().inflate(60, 60)
+        ]
+        keep_clear.extend(player.get_rect().inflate(300, 300) for player in self.players)
+        loaded, dropped = self.chunk_world.stream(self.cameras, keep_clear)
+        if not loaded and not dropped:
+            return
+            
+        # Enemies roam between chunks, so they belong to whichever loaded chunk they are in
+        chunks = self.chunk_world.chunks
+        self.enemies = [e for e in self.enemies if self.chunk_world.chunk_key(e.x, e.y) in chunks]
+        for chunk in loaded:
+            self.enemies.extend(chunk.enemies)
+            chunk.enemies = []
+        self.obstacles = [obs for chunk in chunks.values() for obs in chunk.obstacles]
+        self.background_elements = [e for chunk in chunks.values() for e in chunk.background_elements]
         
     def create_obstacles(self):
+        level = WORLDS.compiled_level(self.current_world)
+        if level is not None:
+            self.obstacles = level.create_obstacles()
+            # Keep the portal off the hand-authored layout
+            attempts = 0
+            while attempts < 100 and not level.is_clear(self.portal.x, self.portal.y, self.portal.radius):
+                self.portal.place()
+                attempts += 1
+            return
+            
         self.obstacles = []
         shapes = ["rectangle", "circle", "triangle", "brick"]
         obstacle_count = self.world_config["obstacle_count"]
@@ -786,14 +2975,26 @@ class Game:
         self.enemies = []
         enemy_colors = [RED, ORANGE, PURPLE, YELLOW, (255, 0, 255)]
         
+        level = WORLDS.compiled_level(self.current_world)
+        if level is not None:
+            # Pick from the baked spawn table instead of probing random positions
+            spawns = [(x, y) for x, y in level.spawns
+                      if not any(circles_overlap(x, y, 20, p.x, p.y, p.radius + 20) for p in self.players)
+                      and not circles_overlap(x, y, 20, self.portal.x, self.portal.y, self.portal.radius + 20)]
+            for i in range(min(self.world_config["enemy_count"], len(spawns))):
+                x, y = spawns.pop(random.randrange(len(spawns)))
+                color = enemy_colors[i % len(enemy_colors)]
+                self.enemies.append(Enemy(x, y, self.world_config["enemy_speed"], color))
+            return
+        
         for i in range(self.world_config["enemy_count"]):
             attempts = 0
             while attempts < 100:  # Prevent infinite loop
                 x = random.randint(BORDER_THICKNESS + 30, SCREEN_WIDTH - BORDER_THICKNESS - 30)
                 y = random.randint(BORDER_THICKNESS + 30, SCREEN_HEIGHT - BORDER_THICKNESS - 30)
                 
-                # Check if too close to player (circle)
-                if circles_overlap(x, y, 20, self.player.x, self.player.y, self.player.radius + 20):
+                # Check if too close to a player (circle)
+                if any(circles_overlap(x, y, 20, p.x, p.y, p.radius + 20) for p in self.players):
                     attempts += 1
                     continue
                     
@@ -802,10 +3003,10 @@ class Game:
                     attempts += 1
                     continue
                     
-                # Check collision with obstacles
+                # Check collision with obstacles, bounding rect first and then the exact shape
                 collision_with_obstacle = False
                 for obs in self.obstacles:
-                    if circle_rect_overlap(x, y, 20, obs.get_rect()):
+                    if circle_rect_overlap(x, y, 20, obs.get_rect()) and obs.overlaps_circle(x, y, 20):
                         collision_with_obstacle = True
                         break
                         
@@ -822,23 +3023,22 @@ class Game:
         element_types = self.world_config["bg_elements"]
         
         for element_type in element_types:
-            count = 5 if element_type in ["cloud", "bat", "water_drop", "smoke", "lava_bubble"] else 3
-            
-            for _ in range(count):
+            for _ in range(BG_ELEMENTS[element_type].count):
                 x = random.randint(0, SCREEN_WIDTH)
                 y = random.randint(0, SCREEN_HEIGHT)
                 self.background_elements.append(BackgroundElement(x, y, element_type))
                 
     def spawn_power_up(self):
         if len(self.power_ups) < 2:
-            power_types = ["speed", "shield", "freeze"]
+            power_types = list(POWER_UPS)
             power_type = random.choice(power_types)
+            area = self.spawn_area()
             
             while True:
-                x = random.randint(BORDER_THICKNESS, SCREEN_WIDTH - BORDER_THICKNESS)
-                y = random.randint(BORDER_THICKNESS, SCREEN_HEIGHT - BORDER_THICKNESS)
+                x = random.randint(area.left + BORDER_THICKNESS, area.right - BORDER_THICKNESS)
+                y = random.randint(area.top + BORDER_THICKNESS, area.bottom - BORDER_THICKNESS)
                 
-                player_dist = math.sqrt((x - self.player.x) ** 2 + (y - self.player.y) ** 2)
+                player_dist = self.player_distance(x, y)
                 portal_dist = math.sqrt((x - self.portal.x) ** 2 + (y - self.portal.y) ** 2)
                 
                 if player_dist > 100 and portal_dist > 100:
@@ -848,13 +3048,14 @@ class Game:
     def spawn_additional_enemies(self):
         enemy_colors = [RED, ORANGE, PURPLE, YELLOW, (255, 0, 255)]
         count = random.randint(1, 2)
+        area = self.spawn_area()
         
         for _ in range(count):
             while True:
-                x = random.randint(BORDER_THICKNESS + 30, SCREEN_WIDTH - BORDER_THICKNESS - 30)
-                y = random.randint(BORDER_THICKNESS + 30, SCREEN_HEIGHT - BORDER_THICKNESS - 30)
+                x = random.randint(area.left + BORDER_THICKNESS + 30, area.right - BORDER_THICKNESS - 30)
+                y = random.randint(area.top + BORDER_THICKNESS + 30, area.bottom - BORDER_THICKNESS - 30)
                 
-                player_dist = math.sqrt((x - self.player.x) ** 2 + (y - self.player.y) ** 2)
+                player_dist = self.player_distance(x, y)
                 
                 if player_dist > 200:
                     color = random.choice(enemy_colors)
@@ -863,7 +3064,13 @@ class Game:
                     self.enemies.append(new_enemy)
                     break
                     
-    def save_game(self):
+    def save_game(self, path=SAVE_FILE):
+        # Open-world levels are regenerated from chunks, and races and co-op sessions are not progress
+        if self.open_world or self.race is not None or self.player_count > 1:
+            return False
+            
+        # Each save starts a new journal generation, superseding the events logged so far
+        self.journal_generation += 1
         save_data = {
             "current_world_index": self.current_world_index,
             "player": self.player.to_dict(),
@@ -872,26 +3079,32 @@ class Game:
             "lives": self.lives,
             "score": self.score,
             "time_remaining": self.time_remaining,
-            "level_start_time": self.level_start_time,
             "obstacles": [obs.to_dict() for obs in self.obstacles],
             "power_ups": [pu.to_dict() for pu in self.power_ups],
-            "active_powers": self.active_powers,
-            "portal_cycle_count": self.portal_cycle_count
+            # A copy: the journal thread serializes this later, while the game keeps changing the powers
+            "active_powers": dict(self.active_powers),
+            "portal_cycle_count": self.portal_cycle_count,
+            "timers": self.timers.to_dict(),
+            "portal_timer": self.portal_timer,
+            "journal_generation": self.journal_generation
         }
         
+        if self.journal is not None:
+            # Written by the journal thread, in order with the events before it
+            self.journal.checkpoint(save_data)
+            return True
         try:
-            with open(SAVE_FILE, 'w') as f:
-                json.dump(save_data, f)
+            write_save(path, save_data)
             return True
         except:
             return False
             
-    def load_game(self):
-        if not os.path.exists(SAVE_FILE):
+    def load_game(self, path=SAVE_FILE):
+        if not os.path.exists(path):
             return False
             
         try:
-            with open(SAVE_FILE, 'r') as f:
+            with open(path, 'r') as f:
                 save_data = json.load(f)
             
             self.current_world_index = save_data["current_world_index"]
@@ -910,7 +3123,9 @@ class Game:
             self.lives = save_data["lives"]
             self.score = save_data["score"]
             self.time_remaining = save_data["time_remaining"]
-            self.level_start_time = save_data["level_start_time"]
+            # The tick clock restarts with the process, so only the time already spent carries over
+            elapsed = self.world_config["time_limit"] - self.time_remaining
+            self.level_start_time = self.now() - int(elapsed * 1000)
             
             self.obstacles = []
             for obs_data in save_data["obstacles"]:
@@ -920,21 +3135,58 @@ class Game:
             for pu_data in save_data["power_ups"]:
                 self.power_ups.append(PowerUp.from_dict(pu_data))
             
-            self.active_powers = save_data["active_powers"]
             self.portal_cycle_count = save_data["portal_cycle_count"]
+            if "timers" in save_data:
+                self.active_powers = save_data["active_powers"]
+                self.timers = TimerWheel.from_dict(save_data["timers"])
+                self.portal_timer = save_data.get("portal_timer", 0)
+            else:
+                # Saves from before the timer wheel keep each power's remaining ticks instead of a timer id
+                self.timers = TimerWheel()
+                self.active_powers = {power_type: self.timers.schedule(remaining, "power_expired", power_type)
+                                      for power_type, remaining in save_data["active_powers"].items()}
+                phase_time = self.portal.visible_time if self.portal.visible else self.portal.hidden_time
+                self.portal_timer = self.timers.schedule(phase_time * FPS // 1000, "portal_toggle")
+                self.timers.schedule(POWER_UP_INTERVAL, "spawn_power_up")
+            self.journal_generation = save_data.get("journal_generation", 0)
             
             # Create spawn platform when loading game
-            platform_width = 120
-            platform_height = 60
-            platform_x = SCREEN_WIDTH // 2 - platform_width // 2
-            platform_y = SCREEN_HEIGHT // 2 - platform_height // 2
-            self.spawn_platform = SpawnPlatform(platform_x, platform_y, platform_width, platform_height)
+            self.create_spawn_platform()
             
             self.create_background()
+            self.rewind.clear()
+            self.audio.ambient(self.world_config["ambient"])
             return True
-        except:
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+            print(f"Could not load {path}, starting a new game: {e!r}")
             return False
             
+    def start_journal(self, path=JOURNAL_FILE, save_path=SAVE_FILE):
+        if not self.open_world and self.race is None and self.player_count == 1:
+            self.journal = Journal(path, save_path, self.journal_generation)
+            self.journal.start()
+            
+    def log_event(self, event, value):
+        if self.journal is not None:
+            self.journal.log_event(self.ticks, event, value)
+            
+    def replay_journal(self, path=JOURNAL_FILE):
+        # Re-applies the progress logged after the save, through the same methods that made it
+        for _, event, value in Journal.read(path, self.journal_generation):
+            if event == Journal.RESET:
+                self.reset_game()
+                self.state = "PLAYING"
+            elif event == Journal.LEVEL:
+                self.current_world_index = value - 1
+                self.next_level()
+                self.state = "PLAYING"
+            elif event == Journal.LIVES:
+                self.lives = value
+                if value <= 0:
+                    self.state = "GAME_OVER"
+            elif event == Journal.SCORE:
+                self.score += value
+                
     def next_level(self):
         self.current_world_index += 1
         if self.current_world_index >= len(self.worlds_list):
@@ -944,38 +3196,158 @@ class Game:
         self.world_config = WORLDS[self.current_world]
         self.portal = Portal(self.world_config)
         self.time_remaining = self.world_config["time_limit"]
-        self.level_start_time = pygame.time.get_ticks()
+        self.level_start_time = self.now()
         
         # Create spawn platform for the new level
-        platform_width = 120
-        platform_height = 60
-        platform_x = SCREEN_WIDTH // 2 - platform_width // 2
-        platform_y = SCREEN_HEIGHT // 2 - platform_height // 2
-        self.spawn_platform = SpawnPlatform(platform_x, platform_y, platform_width, platform_height)
+        self.create_spawn_platform()
         
-        # Position player at the center of the platform
-        self.player.x, self.player.y = self.spawn_platform.get_center()
-        self.player.trail = []
+        # Line the players up on the platform
+        for player in self.players:
+            self.respawn(player)
         
-        self.create_obstacles()
-        self.create_enemies()
-        self.create_background()
+        self.create_level()
+        self.audio.ambient(self.world_config["ambient"])
         
         self.power_ups = []
-        self.active_powers = {}
+        for power_type in list(self.active_powers):
+            self.timers.cancel(self.active_powers[power_type])
+            self.on_power_expired(power_type)
+        self.timers.cancel(self.portal_timer)
+        self.portal_timer = self.timers.schedule(self.portal.visible_time * FPS // 1000, "portal_toggle")
         self.portal_cycle_count = 0
+        self.rewind.clear()
         
         self.score += 100
+        self.log_event(Journal.LEVEL, self.current_world_index)
+        if self.trajectory is not None:
+            self.trajectory.begin_episode(self.current_world_index)
+        self.plugins.level_load(self)
+        
+    def activate_power(self, power_type, duration):
+        if power_type in self.active_powers:
+            self.timers.cancel(self.active_powers[power_type])
+        POWER_UPS[power_type].activate(self)
+        self.active_powers[power_type] = self.timers.schedule(duration, "power_expired", power_type)
+        
+    def on_power_expired(self, power_type):
+        del self.active_powers[power_type]
+        POWER_UPS[power_type].deactivate(self)
+            
+    def on_portal_toggle(self, _):
+        ticks = self.portal.toggle()
+        self.audio.play("portal")
+        if not self.portal.visible:
+            self.audio.play("enrage")
+            for enemy in self.enemies:
+                enemy.make_enraged()
+            self.spawn_additional_enemies()
+            self.portal_cycle_count += 1
+        else:
+            for enemy in self.enemies:
+                enemy.calm_down()
+        self.portal_timer = self.timers.schedule(ticks, "portal_toggle")
+        
+    def on_spawn_power_up(self, _):
+        self.spawn_power_up()
+        self.timers.schedule(POWER_UP_INTERVAL, "spawn_power_up")
+        
+    def capture_snapshot(self, buffer, offset):
+        now = self.now()
+        powers = [self.active_powers.get(power_type, -1) for power_type in POWER_TYPES]
+        enemies = self.enemies
+        power_ups = self.power_ups
+        self.SNAPSHOT.pack_into(
+            buffer, offset,
+            GAME_STATES.index(self.state), self.lives, self.score, self.portal_cycle_count,
+            now - self.level_start_time, *powers, self.portal_timer,
+            self.player.x, self.player.y, self.player.speed, self.player.shield_active,
+            self.portal.visible, self.portal.pulse,
+            len(enemies), len(power_ups))
+        offset = self.timers.pack_into(buffer, offset + self.SNAPSHOT.size)
+        for enemy in enemies:
+            enemy.pack_into(buffer, offset)
+            offset += Enemy.SNAPSHOT.size
+        for power_up in power_ups:
+            power_up.pack_into(buffer, offset)
+            offset += PowerUp.SNAPSHOT.size
+            
+    def snapshot_fits(self):
+        return (len(self.enemies) <= SNAPSHOT_MAX_ENEMIES
+                and len(self.power_ups) <= SNAPSHOT_MAX_POWER_UPS
+                and len(self.timers.timers) <= SNAPSHOT_MAX_TIMERS
+                and self.built_in_kinds())
+        
+    def built_in_kinds(self):
+        # Snapshots only pack the built-in enemy and power-up kinds
+        if len(ENEMY_TYPES) == 1 and len(POWER_UPS) == len(POWER_TYPES):
+            return True
+        return (all(type(enemy) is Enemy for enemy in self.enemies)
+                and all(power_up.type in POWER_TYPES for power_up in self.power_ups)
+                and all(power_type in POWER_TYPES for power_type in self.active_powers))
+        
+    def restore_snapshot(self, buffer, offset):
+        now = self.now()
+        (state_index, self.lives, self.score, self.portal_cycle_count,
+         level_elapsed, speed_timer, shield_timer, freeze_timer, self.portal_timer,
+         self.player.x, self.player.y, self.player.speed, self.player.shield_active,
+         self.portal.visible, self.portal.pulse,
+         enemy_count, power_up_count) = self.SNAPSHOT.unpack_from(buffer, offset)
+        offset = self.timers.unpack_from(buffer, offset + self.SNAPSHOT.size)
+        
+        self.state = GAME_STATES[state_index]
+        self.level_start_time = now - level_elapsed
+        self.player.trail = []
+        self.active_powers = {}
+        for power_type, timer in zip(POWER_TYPES, (speed_timer, shield_timer, freeze_timer)):
+            if timer >= 0:
+                self.active_powers[power_type] = timer
+                
+        # Reuse the existing enemy objects, only growing or shrinking the list
+        del self.enemies[enemy_count:]
+        while len(self.enemies) < enemy_count:
+            self.enemies.append(Enemy(0, 0, 0, RED))
+        for enemy in self.enemies:
+            enemy.unpack_from(buffer, offset)
+            offset += Enemy.SNAPSHOT.size
+            
+        self.power_ups = []
+        for _ in range(power_up_count):
+            self.power_ups.append(PowerUp.unpack_from(buffer, offset))
+            offset += PowerUp.SNAPSHOT.size
+            
+    def rewind_step(self):
+        offset = self.rewind.pop()
+        if offset is not None:
+            lives, score = self.lives, self.score
+            self.restore_snapshot(self.rewind.buffer, offset)
+            # Rewinding can hand back a life or points, which the journal has to follow
+            if self.lives != lives:
+                self.log_event(Journal.LIVES, self.lives)
+            if self.score != score:
+                self.log_event(Journal.SCORE, self.score - score)
         
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 return False
                 
+            # The simulation stops while the window is in the background, so the level timer holds too
+            if event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWMINIMIZED):
+                self.paused = True
+            elif event.type in (pygame.WINDOWFOCUSGAINED, pygame.WINDOWRESTORED):
+                self.paused = False
+                
             if self.exit_button.handle_event(event):
                 self.save_game()
                 return False
                     
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                index = RENDER_SCALES.index(self.render_scale) if self.render_scale in RENDER_SCALES else -1
+                self.set_render_scale(RENDER_SCALES[(index + 1) % len(RENDER_SCALES)])
+                
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                self.show_vision = not self.show_vision
+                
             if self.state == "PLAYING":
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.save_game()
@@ -993,117 +3365,346 @@ class Game:
                     
         return True
         
-    def update(self):
+    def update(self, dt=1, keys=None):
+        # dt > 1 advances several ticks in one coarse step (headless fast-forward)
         if self.state != "PLAYING":
             return
             
-        keys = pygame.key.get_pressed()
-        self.player.move(keys, self.obstacles)
+        self.ticks += dt
+        if keys is None:
+            keys = pygame.key.get_pressed()
+        # Hold BACKSPACE to scrub backward through the last few seconds (single player, not in open world or races)
+        if keys[pygame.K_BACKSPACE] and self.rewindable() and self.race is None:
+            self.rewind_step()
+            return
+            
+        bounds = (self.arena_width, self.arena_height)
+        for player, gamepad in zip(self.players, self.gamepads):
+            player.move(keys if gamepad is None else gamepad.poll(), self.obstacles, bounds, dt)
         
+        if self.open_world:
+            self.follow_players()
+            self.stream_chunks()
+            
+        # Outside the simulated area around the viewports, entities are frozen
+        simulate_all = not self.open_world
         for element in self.background_elements:
-            element.update()
+            if simulate_all or self.in_view(element.x, element.y, SIMULATION_MARGIN):
+                element.update(dt)
         
-        for enemy in self.enemies:
-            enemy.update(self.player, self.obstacles)
-            
-        portal_result = self.portal.update()
-        if portal_result is not None:
-            if portal_result:
-                for enemy in self.enemies:
-                    enemy.make_enraged()
-                self.spawn_additional_enemies()
-                self.portal_cycle_count += 1
-            else:
-                for enemy in self.enemies:
-                    enemy.calm_down()
+        self.update_enemies(bounds, dt, simulate_all)
+            
+        self.portal.update(dt)
         
         for power_up in self.power_ups[:]:
-            power_up.update()
-            
-        for power_type, timer in list(self.active_powers.items()):
-            timer -= 1
-            if timer <= 0:
-                if power_type == "speed":
-                    self.player.deactivate_power("speed")
-                elif power_type == "freeze":
-                    for enemy in self.enemies:
-                        enemy.frozen = False
-                        enemy.speed = enemy.base_speed * (1.5 if enemy.enraged else 1)
-                del self.active_powers[power_type]
-            else:
-                self.active_powers[power_type] = timer
-        
-        self.power_up_timer += 1
-        if self.power_up_timer > 300:
-            self.spawn_power_up()
-            self.power_up_timer = 0
+            power_up.update(dt)
+            
+        # Portal toggles, power-up expiry and spawns fire from the timer wheel
+        for _ in range(dt):
+            self.timers.advance(self.timer_handlers)
+        self.plugins.tick(self, dt)
         
-        elapsed = (pygame.time.get_ticks() - self.level_start_time) / 1000
+        elapsed = (self.now() - self.level_start_time) / 1000
         self.time_remaining = max(0, self.world_config["time_limit"] - elapsed)
         
-        player_rect = self.player.get_rect()
-        
-        for enemy in self.enemies:
-            if player_rect.colliderect(enemy.get_rect()):
-                if not self.player.shield_active:
-                    self.lives -= 1
-                    if self.lives <= 0:
-                        self.state = "GAME_OVER"
-                        self.save_best_score()
-                    else:
-                        # Respawn player on platform
-                        self.player.x, self.player.y = self.spawn_platform.get_center()
-                        self.player.trail = []
-                        self.player.shield_active = True
-                        self.player.shield_timer = 120
+        # Lives, score and the portal are shared: any player can lose a life or finish the level
+        # Everything here is round, so contacts are exact circle tests; a rect test first would cost more than it saves
+        for player in self.players:
+            px, py, radius = player.x, player.y, player.radius
+            
+            for enemy in self.enemies:
+                if circles_overlap(px, py, radius, enemy.x, enemy.y, enemy.radius):
+                    self.plugins.collision(self, player, enemy)
+                    if not player.shield_active:
+                        self.lives -= 1
+                        self.log_event(Journal.LIVES, self.lives)
+                        self.audio.play("life_lost")
+                        if self.lives <= 0:
+                            self.state = "GAME_OVER"
+                            self.save_best_score()
+                        else:
+                            # Respawn player on platform
+                            self.respawn(player)
+                            self.activate_power("shield", 120)
+                    break
+            if self.state == "GAME_OVER":
                 break
                 
-        if self.portal.visible and player_rect.colliderect(self.portal.get_rect()):
-            self.state = "LEVEL_COMPLETE"
-            
-        for power_up in self.power_ups[:]:
-            if player_rect.colliderect(power_up.get_rect()):
-                if power_up.type == "speed":
-                    self.player.activate_power("speed")
-                elif power_up.type == "shield":
-                    self.player.activate_power("shield")
-                elif power_up.type == "freeze":
-                    for enemy in self.enemies:
-                        enemy.freeze()
+            portal = self.portal
+            if portal.visible and circles_overlap(px, py, radius, portal.x, portal.y, portal.radius):
+                self.plugins.collision(self, player, self.portal)
+                if self.state != "LEVEL_COMPLETE":
+                    self.audio.play("level_complete")
+                self.state = "LEVEL_COMPLETE"
                 
-                self.active_powers[power_up.type] = power_up.duration
-                self.power_ups.remove(power_up)
-                self.score += 50
+            for power_up in self.power_ups[:]:
+                if circles_overlap(px, py, radius, power_up.x, power_up.y, power_up.radius):
+                    self.plugins.collision(self, player, power_up)
+                    self.activate_power(power_up.type, power_up.duration)
+                    self.power_ups.remove(power_up)
+                    self.score += 50
+                    self.audio.play("power_up")
+                    if power_up.type in POWER_TYPES:
+                        self.log_event(Journal.POWER_UP, POWER_TYPES.index(power_up.type))
+                    self.log_event(Journal.SCORE, 50)
             
         if self.time_remaining <= 0:
             self.lives -= 1
+            self.log_event(Journal.LIVES, self.lives)
+            self.audio.play("life_lost")
             if self.lives <= 0:
                 self.state = "GAME_OVER"
                 self.save_best_score()
             else:
-                self.level_start_time = pygame.time.get_ticks()
+                self.level_start_time = self.now()
                 self.time_remaining = self.world_config["time_limit"]
-                # Respawn player on platform
-                self.player.x, self.player.y = self.spawn_platform.get_center()
-                self.player.trail = []
+                # Respawn the players on the platform
+                for player in self.players:
+                    self.respawn(player)
+                
+        if self.rewindable():
+            if self.snapshot_fits():
+                self.capture_snapshot(self.rewind.buffer, self.rewind.push())
+            else:
+                # Too many entities to record; drop the history instead of truncating it
+                self.rewind.clear()
+        if self.trajectory is not None:
+            self.trajectory.record(self)
+        if self.race is not None:
+            self.race.record(self)
+            if self.state == "LEVEL_COMPLETE":
+                placed = self.race.finish()
+                print(f"Finished in {self.race.tick / FPS:.2f}s" + (", a new ghost" if placed else ""))
+                self.race = None
+            elif self.state == "GAME_OVER":
+                self.race = None
     
+    def rewindable(self):
+        # Snapshots hold one player and a fixed-size arena
+        return not self.open_world and self.player_count == 1
+        
+    def follow_players(self):
+        for camera, player in zip(self.cameras, self.players):
+            camera.follow(player.x, player.y, self.arena_width, self.arena_height)
+            
+    def update_enemies(self, bounds, dt, simulate_all=True):
+        player = self.player
+        shared = self.player_count > 1
+        enemies = self.enemies
+        separation = self.world_config["crowd"]["separation"]
+        alignment = self.world_config["crowd"]["alignment"]
+        crowded = (separation or alignment) and len(enemies) > 1
+        if crowded:
+            self.crowd_grid.rebuild(enemies)
+        steer = (0.0, 0.0)
+        visibility = self.visibility()
+        for i, enemy in enumerate(enemies):
+            if enemy.frozen or not (simulate_all or self.in_view(enemy.x, enemy.y, SIMULATION_MARGIN)):
+                continue
+            if shared:
+                # Each enemy chases whichever player is closest
+                player = self.nearest_player(enemy.x, enemy.y)
+            distant = self.ai_lod and enemy.is_distant(player)
+            if distant and enemy.glide_ticks >= dt:
+                enemy.glide(dt)
+                continue
+            if crowded:
+                steer = crowd_steering(i, enemies, self.crowd_grid.near(enemy.x, enemy.y), separation, alignment)
+            if not distant:
+                # Near the player: full rate, dropping any glide in progress
+                enemy.glide_ticks = 0
+                enemy.update(player, self.obstacles, bounds, dt, steer, visibility)
+            else:
+                remaining = dt - enemy.glide_ticks
+                enemy.glide(enemy.glide_ticks)
+                # Plans end on staggered ticks so distant enemies don't all replan together
+                ticks = AI_LOD_INTERVAL - (self.ticks + i) % AI_LOD_INTERVAL
+                enemy.plan(player, self.obstacles, bounds, max(ticks, remaining), steer, visibility)
+                enemy.glide(remaining)
+                
+    def visibility(self):
+        # Rebuilt whenever the obstacle list is replaced (a new level, a streamed chunk or a load) or grows or shrinks
+        grid = self.vision_grid
+        if grid is None or grid.obstacles is not self.obstacles or grid.count != len(self.obstacles):
+            self.vision_grid = VisibilityGrid(self.obstacles, self.arena_width, self.arena_height)
+        return self.vision_grid
+        
+    def obstacle_layer(self):
+        # Fixed-size levels never move their obstacles, so they are drawn once per level and scale
+        if self.open_world:
+            return None
+        baked = self.baked_obstacles
+        if (baked is not None and baked[0] is self.obstacles and baked[1] == len(self.obstacles)
+                and baked[2] == self.render_scale):
+            return baked[3]
+        size = self.world_surface.get_size()
+        key = AssetCache.key("obstacles", self.world_config, [o.frame_state() for o in self.obstacles],
+                             size, self.render_scale)
+        layer = ASSETS.load(key)
+        if layer is None:
+            layer = pygame.Surface(size).convert()
+            layer.fill(ASSET_COLORKEY)
+            camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, self.render_scale)
+            for obstacle in self.obstacles:
+                obstacle.draw(layer, camera)
+            ASSETS.store(key, layer)
+        else:
+            layer = layer.convert()
+        # Run-length encoded, blitting the layer skips the transparent spans almost for free
+        layer.set_colorkey(ASSET_COLORKEY, pygame.RLEACCEL)
+        self.baked_obstacles = (self.obstacles, len(self.obstacles), self.render_scale, layer)
+        return layer
+        
+    def vision_overlay(self, camera):
+        # Each visible enemy's sight polygon, and the player it currently sees, if any
+        visibility = self.visibility()
+        overlay = []
+        for enemy in self.enemies:
+            if not camera.sees(enemy.x, enemy.y, enemy.vision_range):
+                continue
+            player = self.nearest_player(enemy.x, enemy.y)
+            points = []
+            for i in range(VISION_RAYS):
+                angle = i * 2 * math.pi / VISION_RAYS
+                distance = visibility.ray(enemy.x, enemy.y, angle, enemy.vision_range)
+                points.append((enemy.x + distance * math.cos(angle), enemy.y + distance * math.sin(angle)))
+            sees_player = (math.hypot(player.x - enemy.x, player.y - enemy.y) < enemy.vision_range
+                           and enemy.sees(player, visibility))
+            overlay.append((enemy.x, enemy.y, tuple(points), (player.x, player.y) if sees_player else None,
+                            enemy.color))
+        return tuple(overlay)
+        
+    def layout_views(self):
+        # One shared view while the arena fits on screen; in open world each player gets a viewport
+        width, height = SCREEN_WIDTH, SCREEN_HEIGHT
+        count = self.player_count if self.open_world else 1
+        if count == 1:
+            self.view_rects = [pygame.Rect(0, 0, width, height)]
+        elif count == 2:
+            self.view_rects = [pygame.Rect(0, 0, width // 2, height), pygame.Rect(width // 2, 0, width // 2, height)]
+        else:
+            self.view_rects = [pygame.Rect(col * width // 2, row * height // 2, width // 2, height // 2)
+                               for row in range(2) for col in range(2)][:count]
+        self.cameras = [Camera(rect.width, rect.height) for rect in self.view_rects]
+        self.camera = self.cameras[0]
+        
+    def set_render_scale(self, scale):
+        self.render_scale = scale
+        for camera in self.cameras:
+            camera.scale = scale
+        if scale == 1.0:
+            self.world_surface = self.screen
+        else:
+            size = (int(SCREEN_WIDTH * scale), int(SCREEN_HEIGHT * scale))
+            self.world_surface = pygame.Surface(size).convert()
+        if len(self.view_rects) == 1:
+            self.view_surfaces = [self.world_surface]
+        else:
+            # Viewports draw into their part of the one world surface, so a single upscale covers them all
+            self.view_surfaces = [self.world_surface.subsurface(
+                pygame.Rect(int(r.x * scale), int(r.y * scale), int(r.width * scale), int(r.height * scale)))
+                for r in self.view_rects]
+            
+    def capture_views(self):
+        return tuple(FrameSnapshot.capture(self, view) for view in range(len(self.cameras)))
+        
     def draw(self):
-        self.screen.fill(self.world_config["bg_color"])
-        pygame.draw.rect(self.screen, BORDER_COLOR, (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT), BORDER_THICKNESS)
+        self.render_views(self.capture_views())
+        pygame.display.flip()
+        
+    def render_frame(self, frame):
+        self.render_views((frame,))
+        
+    def render_views(self, frames):
+        for frame in frames:
+            self.draw_world(frame)
+            self.plugins.draw(self, frame)
+        surface = frames[0].surface.get_parent() or frames[0].surface
+        if surface is not self.screen:
+            # One upscale per frame; the HUD is then drawn at native resolution
+            pygame.transform.scale(surface, (SCREEN_WIDTH, SCREEN_HEIGHT), self.screen)
+        if len(frames) > 1:
+            for i, rect in enumerate(self.view_rects):
+                pygame.draw.rect(self.screen, BLACK, rect, 2)
+                label = self.render_text(self.small_font, f"P{i + 1}", PLAYER_COLORS[i])
+                self.screen.blit(label, (rect.left + 10, rect.bottom - 34))
+        # The HUD is shared, drawn once over all the viewports
+        self.draw_hud(frames[0])
+        
+    def render_text(self, font, text, color):
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
+        
+    def draw_world(self, frame):
+        # One method per layer in RENDER_LAYERS, so --golden can time each on its own
+        self.draw_background(frame)
+        self.draw_obstacles(frame)
+        self.draw_actors(frame)
+        self.draw_players(frame)
+        
+    def draw_background(self, frame):
+        surface = frame.surface
+        camera = frame.camera
+        surface.fill(frame.bg_color)
+        pygame.draw.rect(surface, BORDER_COLOR, camera.rect(0, 0, *frame.arena_size),
+                         camera.line(BORDER_THICKNESS))
         
         # Draw spawn platform
-        self.spawn_platform.draw(self.screen)
+        SpawnPlatform.render(surface, camera, *frame.spawn_platform)
         
-        for element in self.background_elements:
-            element.draw(self.screen)
+        # The snapshot only holds entities inside the viewport
+        for element in frame.background_elements:
+            BackgroundElement.render(surface, camera, *element)
+        
+    def draw_obstacles(self, frame):
+        if frame.obstacle_layer is not None:
+            frame.surface.blit(frame.obstacle_layer, frame.camera.point(0, 0))
+        for obstacle in frame.obstacles:
+            Obstacle.render(frame.surface, frame.camera, *obstacle)
+        
+    def draw_actors(self, frame):
+        surface = frame.surface
+        camera = frame.camera
+        for power_up in frame.power_ups:
+            PowerUp.render(surface, camera, *power_up)
+        
+        if frame.portal:
+            Portal.render(surface, camera, *frame.portal)
         
-        for obstacle in self.obstacles:
-            obstacle.draw(self.screen)
+        for x, y, points, target, color in frame.vision:
+            pygame.draw.polygon(surface, color, [camera.point(px, py) for px, py in points], camera.line(1))
+            if target:
+                pygame.draw.line(surface, RED, camera.point(x, y), camera.point(*target), camera.line(2))
         
-        world_text = self.font.render(f"World: {self.current_world}", True, WHITE)
+        # Paired with their class's render, so plugin enemy types draw themselves
+        for render, enemy in frame.enemies:
+            render(surface, camera, *enemy)
+        
+        if frame.ghosts:
+            # Every ghost is the same pre-rendered sprite, blitted in one batch
+            radius = camera.size(15)
+            sprites = {False: translucent_circle(radius, WHITE, GHOST_ALPHA),
+                       True: translucent_circle(radius, YELLOW, GHOST_ALPHA)}
+            blits = []
+            for x, y, own in frame.ghosts:
+                x, y = camera.point(x, y)
+                blits.append((sprites[own], (x - radius, y - radius)))
+            surface.blits(blits, doreturn=False)
+        
+    def draw_players(self, frame):
+        for player in frame.players:
+            Player.render(frame.surface, frame.camera, *player)
+        
+    def draw_hud(self, frame):
+        world_text = self.render_text(self.font, f"World: {frame.world_name}", WHITE)
         self.screen.blit(world_text, (20, 20))
         
-        for i in range(self.lives):
+        for i in range(frame.lives):
             heart_x = 20 + i * 40
             heart_y = 70
             pygame.draw.circle(self.screen, RED, (heart_x, heart_y), 15)
@@ -1118,87 +3719,1221 @@ class Game:
                 (heart_x + 10, heart_y - 5)
             ])
         
-        time_text = self.font.render(f"Time: {int(self.time_remaining)}s", True, WHITE)
+        time_text = self.render_text(self.font, f"Time: {int(frame.time_remaining)}s", WHITE)
         self.screen.blit(time_text, (SCREEN_WIDTH - 200, 20))
         
-        score_text = self.font.render(f"Score: {self.score}", True, WHITE)
+        score_text = self.render_text(self.font, f"Score: {frame.score}", WHITE)
         self.screen.blit(score_text, (SCREEN_WIDTH // 2 - 100, 20))
         
-        best_text = self.small_font.render(f"Best: {self.best_score}", True, YELLOW)
+        best_text = self.render_text(self.small_font, f"Best: {frame.best_score}", YELLOW)
         self.screen.blit(best_text, (SCREEN_WIDTH // 2 - 50, 60))
         
-        for power_up in self.power_ups:
-            power_up.draw(self.screen)
-        
-        self.portal.draw(self.screen)
-        
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
-        
-        self.player.draw(self.screen)
-        
         self.exit_button.draw(self.screen)
         
-        if self.state == "GAME_OVER":
+        if frame.state == "GAME_OVER":
             overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
             overlay.fill((0, 0, 0, 180))
             self.screen.blit(overlay, (0, 0))
             
-            game_over_text = self.font.render("GAME OVER", True, RED)
+            game_over_text = self.render_text(self.font, "GAME OVER", RED)
             text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
             self.screen.blit(game_over_text, text_rect)
             
-            score_text = self.font.render(f"Final Score: {self.score}", True, WHITE)
+            score_text = self.render_text(self.font, f"Final Score: {frame.score}", WHITE)
             score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             self.screen.blit(score_text, score_rect)
             
-            if self.score >= self.best_score:
-                new_record_text = self.font.render("NEW RECORD!", True, YELLOW)
+            if frame.score >= frame.best_score:
+                new_record_text = self.render_text(self.font, "NEW RECORD!", YELLOW)
                 record_rect = new_record_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
                 self.screen.blit(new_record_text, record_rect)
             
-            restart_text = self.small_font.render("Press R to Restart", True, WHITE)
+            restart_text = self.render_text(self.small_font, "Press R to Restart", WHITE)
             restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100))
             self.screen.blit(restart_text, restart_rect)
             
-        elif self.state == "LEVEL_COMPLETE":
+        elif frame.paused:
+            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            overlay.fill((0, 0, 0, 120))
+            self.screen.blit(overlay, (0, 0))
+            
+            paused_text = self.render_text(self.font, "PAUSED", WHITE)
+            self.screen.blit(paused_text, paused_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
+            
+        elif frame.state == "LEVEL_COMPLETE":
             overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
             overlay.fill((0, 0, 0, 180))
             self.screen.blit(overlay, (0, 0))
             
-            complete_text = self.font.render("LEVEL COMPLETE!", True, GREEN)
+            complete_text = self.render_text(self.font, "LEVEL COMPLETE!", GREEN)
             text_rect = complete_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
             self.screen.blit(complete_text, text_rect)
             
-            score_text = self.font.render(f"Score: {self.score}", True, WHITE)
+            score_text = self.render_text(self.font, f"Score: {frame.score}", WHITE)
             score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             self.screen.blit(score_text, score_rect)
             
-            next_text = self.small_font.render("Press SPACE to Continue", True, WHITE)
+            next_text = self.render_text(self.small_font, "Press SPACE to Continue", WHITE)
             next_rect = next_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
             self.screen.blit(next_text, next_rect)
             
             # Show next world preview
-            next_world_index = (self.current_world_index + 1) % len(self.worlds_list)
-            next_world = self.worlds_list[next_world_index]
-            preview_text = self.small_font.render(f"Next: {next_world}", True, YELLOW)
+            preview_text = self.render_text(self.small_font, f"Next: {frame.next_world}", YELLOW)
             preview_rect = preview_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100))
             self.screen.blit(preview_text, preview_rect)
-        
-        pygame.display.flip()
     
-    def run(self):
+    def is_idle(self):
+        return self.idle_mode and (self.paused or self.state != "PLAYING")
+        
+    def run_frame(self, renderer=None, hot_reload=False):
+        # One pass of the main loop; returns False once the player quits
+        if self.is_idle():
+            # Nothing moves, so block on the event queue and redraw only after something happened
+            if renderer:
+                renderer.wait()
+            if self.needs_redraw:
+                self.draw()
+                self.needs_redraw = False
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            events = [event] + pygame.event.get() if event.type != pygame.NOEVENT else []
+            self.needs_redraw = bool(events)
+            if hot_reload:
+                self.reload_worlds()
+            return self.handle_events(events)
+            
+        running = self.handle_events()
+        if hot_reload:
+            self.ticks_to_reload_check -= 1
+            if self.ticks_to_reload_check == 0:
+                self.ticks_to_reload_check = HOT_RELOAD_INTERVAL
+                self.reload_worlds()
+        if not self.paused:
+            keys = pygame.key.get_pressed()
+            if self.recording is not None:
+                self.record_tick(keys)
+            self.update(keys=keys)
+        # Fold a long journal into a fresh save, at a point where a save resumes play cleanly
+        if (self.journal is not None and self.journal.logged >= JOURNAL_COMPACT_EVENTS
+                and self.state == "PLAYING"):
+            self.save_game()
+        if renderer:
+            renderer.submit(self.capture_views())
+        else:
+            self.draw()
+        self.clock.tick(FPS)
+        return running
+        
+    def run(self, pipelined=False, hot_reload=False):
+        # Pipelined: frame N is drawn on a render thread while update computes N+1.
+        # Events and key state are still sampled here, right before each update.
+        renderer = RenderThread(self) if pipelined else None
+        if renderer:
+            renderer.start()
+        self.start_journal()
         running = True
         while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            running = self.run_frame(renderer, hot_reload)
         
+        if renderer:
+            renderer.stop()
+        if self.journal is not None:
+            self.journal.close()
+        if self.recording is not None:
+            self.recording.save()
+        if self.trajectory is not None:
+            self.trajectory.close()
         pygame.quit()
         sys.exit()
 
+def render_replay_shard(job):
+    # Runs in a worker process: re-simulate up to the shard, then render it
+    recording_path, start, stop, target, ffmpeg, render_scale = job
+    recording = Recording.load(recording_path)
+    game = Game(render_scale=render_scale, sound=False)
+    recording.begin(game)
+    encoder = None
+    if ffmpeg:
+        encoder = subprocess.Popen([ffmpeg, "-y", "-loglevel", "error",
+                                    "-f", "rawvideo", "-pix_fmt", "rgb24",
+                                    "-s", f"{SCREEN_WIDTH}x{SCREEN_HEIGHT}", "-r", str(FPS), "-i", "-",
+                                    "-pix_fmt", "yuv420p", target], stdin=subprocess.PIPE)
+    for tick in range(stop):
+        game.update(keys=recording.keys(tick))
+        if tick < start:
+            continue
+        game.render_frame(FrameSnapshot.capture(game))
+        # One frame in flight; the pipe blocks when the encoder falls behind
+        if encoder:
+            encoder.stdin.write(pygame.image.tobytes(game.screen, "RGB"))
+        else:
+            pygame.image.save(game.screen, os.path.join(target, f"frame_{tick:06d}.png"))
+    if encoder:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed while encoding {target}")
+    return stop - start
+
+def export_replay(recording_path, output, workers=None, render_scale=1.0):
+    """Render a recording to a video file (via ffmpeg) or a directory of PNGs"""
+    frames = len(Recording.load(recording_path))
+    workers = max(1, min(workers or os.cpu_count() or 1, frames))
+    root, ext = os.path.splitext(output)
+    ffmpeg = None
+    if ext:
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            raise SystemExit("ffmpeg was not found; export to a directory to get a PNG sequence instead")
+    else:
+        os.makedirs(output, exist_ok=True)
+        
+    # Each worker gets one contiguous range of frames and its own video segment
+    bounds = [frames * i // workers for i in range(workers + 1)]
+    jobs = []
+    for i in range(workers):
+        target = f"{root}.part{i}{ext}" if ffmpeg else output
+        jobs.append((recording_path, bounds[i], bounds[i + 1], target, ffmpeg, render_scale))
+        
+    # Spawned workers start clean and headless instead of inheriting this window.
+    # SDL would otherwise swallow the SIGTERM the pool uses to stop them.
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    start = time.perf_counter()
+    done = 0
+    pool = multiprocessing.get_context("spawn").Pool(workers)
+    try:
+        for count in pool.imap_unordered(render_replay_shard, jobs):
+            done += count
+            print(f"{done}/{frames} frames")
+    finally:
+        pool.close()
+        pool.join()
+    
+    if ffmpeg:
+        list_path = root + ".parts.txt"
+        with open(list_path, "w") as f:
+            for job in jobs:
+                f.write(f"file '{os.path.abspath(job[3])}'\n")
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                        "-i", list_path, "-c", "copy", output], check=True)
+        os.remove(list_path)
+        for job in jobs:
+            os.remove(job[3])
+            
+    elapsed = time.perf_counter() - start
+    print(f"Exported {frames} frames to {output} with {workers} workers "
+          f"in {elapsed:.1f}s ({frames / elapsed:.0f} frames/s)")
+
+def measure_frames(game, frames):
+    # p95 frame time and mean per-phase times (ms) of the full update + draw path
+    keys = RecordedKeys(0)
+    totals = dict.fromkeys(STRESS_PHASES, 0.0)
+    samples = []
+    for _ in range(frames):
+        pygame.event.pump()
+        # Hold the level open: no game over, level complete or time-out mid-measurement
+        game.state = "PLAYING"
+        game.level_start_time = game.now()
+        marks = [time.perf_counter()]
+        game.update(keys=keys)
+        marks.append(time.perf_counter())
+        frame = FrameSnapshot.capture(game)
+        marks.append(time.perf_counter())
+        game.draw_world(frame)
+        marks.append(time.perf_counter())
+        if frame.surface is not game.screen:
+            pygame.transform.scale(frame.surface, (SCREEN_WIDTH, SCREEN_HEIGHT), game.screen)
+        marks.append(time.perf_counter())
+        game.draw_hud(frame)
+        marks.append(time.perf_counter())
+        pygame.display.flip()
+        marks.append(time.perf_counter())
+        for phase, start, end in zip(STRESS_PHASES, marks, marks[1:]):
+            totals[phase] += end - start
+        samples.append(marks[-1] - marks[0])
+    samples.sort()
+    phases = {phase: round(total / frames * 1000, 3) for phase, total in totals.items()}
+    return samples[int(len(samples) * 0.95)] * 1000, phases
+
+def stress_entities(game, entity_type):
+    if entity_type == "enemies":
+        return game.enemies
+    if entity_type == "obstacles":
+        return game.obstacles
+    return game.background_elements
+
+def stress_grow(game, entity_type, count):
+    entities = stress_entities(game, entity_type)
+    if entity_type == "obstacles":
+        # A new list, so everything cached per obstacle list (line of sight, the baked layer) is rebuilt
+        entities = game.obstacles = list(entities)
+    margin = BORDER_THICKNESS + 30
+    while len(entities) < count:
+        if entity_type == "enemies":
+            game.spawn_additional_enemies()
+            continue
+        x = random.randint(margin, SCREEN_WIDTH - margin)
+        y = random.randint(margin, SCREEN_HEIGHT - margin)
+        if entity_type == "obstacles":
+            # Overlap is fine here, but nothing may land on the player
+            width, height = random.randint(20, 60), random.randint(20, 60)
+            if not circle_rect_overlap(game.player.x, game.player.y, game.player.radius + 20,
+                                       pygame.Rect(x, y, width, height)):
+                entities.append(Obstacle(x, y, width, height, random.choice(OBSTACLE_TYPES[:4])))
+        else:
+            entities.append(BackgroundElement(x, y, random.choice(game.world_config["bg_elements"])))
+    del entities[count:]
+
+def run_stress(game, report_path, frames=120):
+    """Ramp enemies, obstacles and background elements per world until frames go over budget"""
+    game.player.shield_active = True
+    report = {
+        "budget_ms": round(FRAME_BUDGET_MS, 2),
+        "frames_per_step": frames,
+        "render_scale": game.render_scale,
+        "cpus": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "worlds": {}
+    }
+    for world_index, world in enumerate(WORLDS):
+        results = {}
+        for entity_type in STRESS_ENTITY_TYPES:
+            # Fresh, reproducible level for every ramp
+            random.seed(world_index)
+            game.current_world_index = world_index - 1
+            game.next_level()
+            game.player.shield_active = True
+            entities = stress_entities(game, entity_type)
+            
+            passing = (len(entities),) + measure_frames(game, frames)
+            failing = None
+            step = max(8, len(entities))
+            if passing[1] > FRAME_BUDGET_MS:
+                failing, passing = passing, None
+            while failing is None and len(stress_entities(game, entity_type)) < STRESS_MAX_COUNT:
+                count = min(len(stress_entities(game, entity_type)) + step, STRESS_MAX_COUNT)
+                stress_grow(game, entity_type, count)
+                result = (count,) + measure_frames(game, frames)
+                if result[1] > FRAME_BUDGET_MS:
+                    failing = result
+                else:
+                    passing = result
+                    step = step * 3 // 2
+                    
+            # Narrow the gap between the last passing and first failing count
+            while passing and failing and failing[0] - passing[0] > max(2, passing[0] // 20):
+                count = (passing[0] + failing[0]) // 2
+                stress_grow(game, entity_type, count)
+                result = (count,) + measure_frames(game, frames)
+                if result[1] > FRAME_BUDGET_MS:
+                    failing = result
+                else:
+                    passing = result
+                    
+            results[entity_type] = {
+                "max_sustainable": passing[0] if passing else 0,
+                "p95_ms_at_max": round(passing[1], 2) if passing else None,
+                "breaking_count": failing[0] if failing else None,
+                "p95_ms_at_break": round(failing[1], 2) if failing else None,
+                "phases_ms_at_break": failing[2] if failing else None,
+                "limited_by": "budget" if failing else "cap"
+            }
+            print(f"{world:12} {entity_type:12} max {results[entity_type]['max_sustainable']:6}"
+                  f" (breaks at {failing[0] if failing else '-'}"
+                  f"{', ' + format(failing[1], '.1f') + ' ms p95' if failing else ''})")
+        report["worlds"][world] = results
+        
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {report_path}")
+
+def image_difference(surface, golden):
+    # Fraction of pixels where some channel differs by more than GOLDEN_TOLERANCE
+    if surface.get_size() != golden.get_size():
+        return 1.0
+    under = surface.copy()
+    under.blit(golden, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    over = golden.convert(surface)
+    over.blit(surface, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    # Saturating subtraction both ways, summed, is the absolute difference
+    under.blit(over, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+    same = pygame.mask.from_threshold(under, (0, 0, 0, 255), (GOLDEN_TOLERANCE + 1,) * 3 + (255,)).count()
+    width, height = surface.get_size()
+    return 1 - same / (width * height)
+
+def run_golden(game, update=False, repeats=50):
+    """Draw a seeded scene of every world and compare it with its golden image.
+    
+    Only the images decide the result. Each layer's median draw time is reported
+    against LAYER_BUDGETS_MS afterwards, since timings vary too much between runs
+    and machines to fail a check on.
+    """
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    game.set_render_scale(1.0)
+    # The HUD shows the best score, which differs between machines
+    game.best_score = 0
+    keys = RecordedKeys(0)
+    passed = True
+    timings = []
+    for world_index, world in enumerate(WORLDS):
+        game.begin_seeded(GOLDEN_SEED, world_index)
+        for _ in range(GOLDEN_TICKS):
+            game.update(keys=keys)
+        # The shield ring pulses off the wall clock, so scenes are drawn without it
+        for player in game.players:
+            player.shield_active = False
+        game.draw()
+        
+        path = os.path.join(GOLDEN_DIR, f"{world}.png")
+        actual = os.path.join(GOLDEN_DIR, f"{world}.actual.png")
+        if update or not os.path.exists(path):
+            pygame.image.save(game.screen, path)
+            result = "golden image written"
+        else:
+            difference = image_difference(game.screen, pygame.image.load(path))
+            if difference > GOLDEN_MAX_DIFF:
+                pygame.image.save(game.screen, actual)
+                result = f"DIFFERS in {difference:.2%} of pixels, see {os.path.basename(actual)}"
+                passed = False
+            else:
+                result = f"matches ({difference:.3%} of pixels past tolerance)"
+                if os.path.exists(actual):
+                    os.remove(actual)
+                    
+        frame = FrameSnapshot.capture(game)
+        times = {layer: [] for layer in RENDER_LAYERS}
+        for _ in range(repeats):
+            for layer in RENDER_LAYERS:
+                start = time.perf_counter()
+                getattr(game, f"draw_{layer}")(frame)
+                times[layer].append((time.perf_counter() - start) * 1000)
+        timings.append((world, {layer: sorted(samples)[repeats // 2] for layer, samples in times.items()}))
+        print(f"{world:12} {result}")
+        
+    print("Median draw time per layer, against its budget (not checked):")
+    for world, medians in timings:
+        over = [layer for layer in RENDER_LAYERS if medians[layer] > LAYER_BUDGETS_MS[layer]]
+        print(f"{world:12} " + ", ".join(f"{layer} {medians[layer]:.2f}/{LAYER_BUDGETS_MS[layer]} ms"
+                                          for layer in RENDER_LAYERS)
+              + (f"; over: {', '.join(over)}" if over else ""))
+    return passed
+
+def benchmark_snapshots(game, iterations=10000):
+    ring = game.rewind
+    for enemy_count in (16, SNAPSHOT_MAX_ENEMIES):
+        while len(game.enemies) < enemy_count:
+            game.spawn_additional_enemies()
+        del game.enemies[enemy_count:]
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            game.capture_snapshot(ring.buffer, ring.push())
+        capture_us = (time.perf_counter() - start) / iterations * 1e6
+        
+        offset = ring.pop()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            game.restore_snapshot(ring.buffer, offset)
+        restore_us = (time.perf_counter() - start) / iterations * 1e6
+        
+        verdict = "ok" if max(capture_us, restore_us) < 50 else "OVER 50 us BUDGET"
+        print(f"{enemy_count} enemies: capture {capture_us:.1f} us, restore {restore_us:.1f} us ({verdict})")
+    print(f"Snapshot slot: {game.SNAPSHOT_SIZE} bytes, ring: {len(ring.buffer) // 1024} KiB")
+
+def benchmark_collision(game, movers=200, ticks=60, repeats=7):
+    # Swept movement against exact circle and triangle shapes, against the same obstacles as plain rects
+    rng = random.Random(3)
+    shapes = ["rectangle", "circle", "triangle", "brick"]
+    obstacles = []
+    placed = []
+    while len(obstacles) < 40:
+        width = rng.randint(50, 100)
+        height = rng.randint(50, 100)
+        rect = pygame.Rect(rng.randint(BORDER_THICKNESS, SCREEN_WIDTH - BORDER_THICKNESS - width),
+                           rng.randint(BORDER_THICKNESS, SCREEN_HEIGHT - BORDER_THICKNESS - height), width, height)
+        if not rects_overlap(rect, placed, 20):
+            placed.append(rect)
+            obstacles.append(Obstacle(rect.x, rect.y, width, height, rng.choice(shapes)))
+    boxes = [Obstacle(obs.x, obs.y, obs.width, obs.height) for obs in obstacles]
+    radius = 15
+    low, high = BORDER_THICKNESS + radius, SCREEN_WIDTH - BORDER_THICKNESS - radius
+    starts = [(rng.uniform(low, high), rng.uniform(low, SCREEN_HEIGHT - BORDER_THICKNESS - radius),
+               rng.uniform(-8, 8), rng.uniform(-8, 8)) for _ in range(movers)]
+    
+    def run(obstacles):
+        for x, y, dx, dy in starts:
+            for _ in range(ticks):
+                x, y, hit = move_circle(x, y, radius, dx, dy, obstacles)
+                if hit:
+                    dx, dy = -dy, dx
+                if not low <= x <= high:
+                    dx = -dx
+                if not low <= y <= SCREEN_HEIGHT - BORDER_THICKNESS - radius:
+                    dy = -dy
+                    
+    def timed(obstacles):
+        start = time.perf_counter()
+        run(obstacles)
+        return (time.perf_counter() - start) / (movers * ticks) * 1e6
+        
+    samples = [(timed(obstacles), timed(boxes)) for _ in range(repeats)]
+    exact, rect_only = (sorted(column)[repeats // 2] for column in zip(*samples))
+    print(f"move_circle: exact shapes {exact:.2f} us, rect-only {rect_only:.2f} us "
+          f"({(exact / rect_only - 1) * 100:+.1f}%)")
+    
+    # Memory held after a full pass: nothing should be built per move and kept
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run(obstacles)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{movers * ticks} moves: {after - before} bytes kept, {peak - before} bytes peak")
+    
+    # Positions touching a circle's or triangle's bounding rect that the exact shape leaves open
+    touching = open_spots = 0
+    for obs in obstacles:
+        if obs.type not in ("circle", "triangle"):
+            continue
+        rect = obs.get_rect()
+        for x in range(rect.left - radius, rect.right + radius, 4):
+            for y in range(rect.top - radius, rect.bottom + radius, 4):
+                if circle_rect_overlap(x, y, radius, rect):
+                    touching += 1
+                    open_spots += not obs.overlaps_circle(x, y, radius)
+    print(f"{open_spots / touching * 100:.0f}% of the player positions touching a circle or triangle's "
+          f"bounding rect are open with the exact shapes")
+    
+    if exact > rect_only * 1.05 or after - before > 4096 or not open_spots:
+        print("FAIL: exact collision costs over 5% more than rect-only, keeps memory, or opens no space")
+        return False
+    return True
+
+def benchmark_timestep(game, trials=500, ticks=48):
+    failures = []
+    # Coarse steps against fine-step ground truth, over layouts with thin walls
+    rng = random.Random(1)
+    shapes = ["rectangle", "circle", "triangle", "brick"]
+    
+    def discrete_move(x, y, radius, dx, dy, obstacles):
+        # The old destination-only test, for comparison
+        rect = pygame.Rect(x + dx - radius, y + dy - radius, radius * 2, radius * 2)
+        if any(rect.colliderect(obs.get_rect()) for obs in obstacles):
+            return x, y, True
+        return x + dx, y + dy, False
+        
+    for name, move in (("swept", move_circle), ("discrete", discrete_move)):
+        for step in (1, 4, 8):
+            errors = []
+            tunneled = 0
+            elapsed = 0.0
+            for _ in range(trials):
+                obstacles = []
+                for _ in range(8):
+                    thin = rng.random() < 0.5
+                    width = rng.randint(3, 8) if thin else rng.randint(50, 100)
+                    height = rng.randint(50, 150) if thin else rng.randint(50, 100)
+                    if rng.random() < 0.5:
+                        width, height = height, width
+                    obstacles.append(Obstacle(rng.randint(0, 400), rng.randint(0, 400), width, height,
+                                              "rectangle" if thin else rng.choice(shapes)))
+                walls = [obs.get_rect() for obs in obstacles if min(obs.width, obs.height) < 10]
+                x, y = rng.uniform(0, 400), rng.uniform(0, 400)
+                while any(obs.overlaps_circle(x, y, 15) for obs in obstacles):
+                    x, y = rng.uniform(0, 400), rng.uniform(0, 400)
+                angle = rng.uniform(0, 2 * math.pi)
+                dx, dy = 5 * math.cos(angle), 5 * math.sin(angle)
+                
+                # Ground truth is always the swept move at the fine step
+                fine_x, fine_y = x, y
+                for _ in range(ticks):
+                    fine_x, fine_y, _ = move_circle(fine_x, fine_y, 15, dx, dy, obstacles)
+                coarse_x, coarse_y = x, y
+                crossed = False
+                for _ in range(ticks // step):
+                    start = time.perf_counter()
+                    next_x, next_y, _ = move(coarse_x, coarse_y, 15, dx * step, dy * step, obstacles)
+                    elapsed += time.perf_counter() - start
+                    crossed = crossed or any(wall.clipline(coarse_x, coarse_y, next_x, next_y) for wall in walls)
+                    coarse_x, coarse_y = next_x, next_y
+                tunneled += crossed
+                errors.append(math.hypot(coarse_x - fine_x, coarse_y - fine_y))
+                
+            errors.sort()
+            exact = sum(1 for e in errors if e < 1) / len(errors) * 100
+            p95 = errors[int(len(errors) * 0.95)]
+            per_step = elapsed / (trials * (ticks // step)) * 1e6
+            print(f"{name:8} {step}x step: {exact:5.1f}% within 1px of fine, "
+                  f"p95 error {p95:6.1f}px, "
+                  f"tunneled {tunneled}/{trials}, {per_step:.1f} us/step")
+            # The old discrete test is only there for comparison
+            if move is move_circle:
+                if tunneled:
+                    failures.append(f"{step}x step tunneled through {tunneled} walls")
+                if p95 > TIMESTEP_MAX_P95_ERROR[step]:
+                    failures.append(f"{step}x step p95 error {p95:.1f}px > {TIMESTEP_MAX_P95_ERROR[step]}px")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+def benchmark_ai(game, ticks=600, enemies=150):
+    # A late-game Volcano level crowded with enemies, the player circling the arena
+    passed = True
+    for enraged in (False, True):
+        costs = {}
+        for lod in (False, True):
+            costs[lod] = run_ai_crowd(game, ticks, enemies, enraged, lod)
+        print(f"{'enraged' if enraged else 'calm'} crowd: speedup {costs[False] / costs[True]:.2f}x")
+        passed = passed and costs[True] < costs[False] * 1.1
+    game.ai_lod = True
+    return passed
+
+def run_ai_crowd(game, ticks, enemies, enraged, lod):
+    random.seed(1)
+    game.ticks = 0
+    game.reset_game()
+    game.current_world_index = game.worlds_list.index("Volcano") - 1
+    game.next_level()
+    while len(game.enemies) < enemies:
+        game.spawn_additional_enemies()
+    if not enraged:
+        for enemy in game.enemies:
+            enemy.calm_down()
+    game.ai_lod = lod
+    bounds = (game.arena_width, game.arena_height)
+    elapsed = 0.0
+    near = 0
+    distances = []
+    for tick in range(ticks):
+        game.player.x = game.arena_width / 2 + 250 * math.cos(tick * 0.02)
+        game.player.y = game.arena_height / 2 + 180 * math.sin(tick * 0.02)
+        game.ticks += 1
+        start = time.perf_counter()
+        game.update_enemies(bounds, 1)
+        elapsed += time.perf_counter() - start
+        near += sum(1 for e in game.enemies if not e.is_distant(game.player))
+        distances.append(sum(math.hypot(e.x - game.player.x, e.y - game.player.y)
+                             for e in game.enemies) / len(game.enemies))
+    distances.sort()
+    cost = elapsed / ticks * 1000
+    print(f"{'enraged' if enraged else 'calm':7} {'lod' if lod else 'full':4}: {cost:.3f} ms/tick "
+          f"for {len(game.enemies)} enemies, {near / (ticks * len(game.enemies)) * 100:.0f}% near the player, "
+          f"median distance to player {distances[len(distances) // 2]:.0f}px")
+    return cost
+
+def benchmark_crowd(game, sizes=(100, 1000, 10000)):
+    # Neighbour queries against brute force, at a late-game Volcano density of one enemy per 3200 px^2
+    passed = True
+    per_enemy = {}
+    for count in sizes:
+        rng = random.Random(count)
+        side = math.sqrt(count * 3200)
+        enemies = [Enemy(rng.uniform(0, side), rng.uniform(0, side), 3.5, RED) for _ in range(count)]
+        for enemy in enemies:
+            enemy.direction = rng.uniform(0, 2 * math.pi)
+        grid = SpatialHash(CROWD_RADIUS)
+        repeats = max(1, 10000 // count)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            grid.rebuild(enemies)
+            hashed = [crowd_steering(i, enemies, grid.near(e.x, e.y), 1.5, 0.2) for i, e in enumerate(enemies)]
+        elapsed = (time.perf_counter() - start) / repeats
+        per_enemy[count] = elapsed / count
+        line = f"{count:6} enemies: spatial hash {elapsed * 1000:8.2f} ms/tick"
+        if count <= 1000:
+            start = time.perf_counter()
+            brute = [crowd_steering(i, enemies, range(count), 1.5, 0.2) for i in range(count)]
+            line += f", brute force {(time.perf_counter() - start) * 1000:8.2f} ms/tick"
+            if any(abs(a - b) > 1e-9 for h, n in zip(hashed, brute) for a, b in zip(h, n)):
+                print(f"FAIL: {count} enemies: spatial hash steering differs from brute force")
+                passed = False
+        print(line)
+    growth = per_enemy[sizes[-1]] / per_enemy[sizes[0]]
+    print(f"cost per enemy grows {growth:.2f}x from {sizes[0]} to {sizes[-1]} enemies")
+    if growth > 3:
+        print("FAIL: neighbour queries are not scaling near-linearly")
+        passed = False
+        
+    # Stacking in the game itself: enraged enemies chasing a still player, with and without separation
+    for weights in ({"separation": 0, "alignment": 0}, WORLDS["Volcano"]["crowd"]):
+        random.seed(1)
+        game.ticks = 0
+        game.reset_game()
+        game.current_world_index = game.worlds_list.index("Volcano") - 1
+        game.next_level()
+        game.world_config = dict(game.world_config, crowd=weights)
+        while len(game.enemies) < 30:
+            game.spawn_additional_enemies()
+        for _ in range(300):
+            game.ticks += 1
+            game.update_enemies((game.arena_width, game.arena_height), 1)
+        stacked = sum(1 for i, a in enumerate(game.enemies) for b in game.enemies[i + 1:]
+                      if math.hypot(a.x - b.x, a.y - b.y) < a.radius)
+        print(f"separation {weights['separation']}, alignment {weights['alignment']}: "
+              f"{stacked} stacked pairs of {len(game.enemies)} enemies after 300 ticks")
+    game.world_config = WORLDS[game.current_world]
+    return passed
+
+def benchmark_vision(game, ticks=600, enemies=48):
+    # Line of sight for a crowd of enemies while the player circles the arena, cached and traced every time
+    passed = True
+    for world in ("Cave", "Volcano"):
+        random.seed(1)
+        game.ticks = 0
+        game.reset_game()
+        game.current_world_index = game.worlds_list.index(world) - 1
+        game.next_level()
+        while len(game.enemies) < enemies:
+            game.spawn_additional_enemies()
+        start = time.perf_counter()
+        visibility = game.visibility()
+        build = time.perf_counter() - start
+        
+        cached = traced = 0.0
+        checks = blocked = 0
+        for tick in range(ticks):
+            player = game.player
+            player.x = game.arena_width / 2 + 250 * math.cos(tick * 0.02)
+            player.y = game.arena_height / 2 + 180 * math.sin(tick * 0.02)
+            in_range = [e for e in game.enemies if math.hypot(player.x - e.x, player.y - e.y) < e.vision_range]
+            start = time.perf_counter()
+            seen = [e.sees(player, visibility) for e in in_range]
+            cached += time.perf_counter() - start
+            start = time.perf_counter()
+            for e in in_range:
+                a, b = visibility.cell(e.x, e.y), visibility.cell(player.x, player.y)
+                visibility.trace(*(a + b if a <= b else b + a))
+            traced += time.perf_counter() - start
+            checks += len(in_range)
+            blocked += seen.count(False)
+        print(f"{world:8} grid built in {build * 1000:.2f} ms; {checks / ticks:.1f} checks/tick, "
+              f"{blocked / max(1, checks) * 100:.0f}% blocked; cached {cached / ticks * 1000:.3f} ms/tick, "
+              f"traced every time {traced / ticks * 1000:.3f} ms/tick, {len(visibility.cache)} cache entries")
+        passed = passed and cached < traced
+    return passed
+
+def benchmark_trajectory(game, ticks=3000):
+    # Recording cost per tick, then reading the rows back against what the game held
+    if np is None:
+        print("numpy is not installed; skipping")
+        return True
+    while len(game.enemies) < 32:
+        game.spawn_additional_enemies()
+    game.player.shield_active = True
+    with tempfile.TemporaryDirectory() as directory:
+        writer = TrajectoryWriter(directory, capacity=1024)
+        writer.begin_episode(game.current_world_index)
+        elapsed = 0.0
+        for _ in range(ticks):
+            game.update()
+            start = time.perf_counter()
+            writer.record(game)
+            elapsed += time.perf_counter() - start
+        writer.close()
+        print(f"record: {elapsed / ticks * 1e6:.1f} us/tick, {TrajectoryWriter.ROW_SIZE} bytes/row")
+        
+        start = time.perf_counter()
+        rows, episodes = read_trajectory(directory)
+        mean_x = float(rows["player"][:, 0].mean())
+        last = rows[-1]
+        elapsed = time.perf_counter() - start
+        print(f"read: mapped {len(rows)} rows and averaged the player x in {elapsed * 1000:.2f} ms")
+        expected = (game.ticks, game.lives, game.score, len(game.enemies))
+        found = (int(last["tick"]), int(last["lives"]), int(last["score"]), int(last["enemy_count"]))
+        enemy = last["enemies"][0]
+        if found != expected or abs(enemy["x"] - game.enemies[0].x) > 1e-3 or len(episodes) != 1 or not mean_x:
+            print(f"FAIL: last row {found} does not match the game {expected}")
+            return False
+    return True
+
+def benchmark_idle(game, seconds=1.5):
+    # CPU time per wall-clock second of the main loop on each screen, with and without the idle loop
+    scenes = (("playing", "PLAYING", False), ("level complete", "LEVEL_COMPLETE", False),
+              ("game over", "GAME_OVER", False), ("unfocused", "PLAYING", True))
+    passed = True
+    for name, state, paused in scenes:
+        usage = {}
+        for idle in (False, True):
+            game.idle_mode = idle
+            game.paused = paused
+            start = time.perf_counter()
+            cpu = time.process_time()
+            while time.perf_counter() - start < seconds:
+                # Hold the scene: no game over or level change while it is measured
+                game.state = state
+                game.lives = 3
+                game.run_frame()
+            usage[idle] = (time.process_time() - cpu) / (time.perf_counter() - start) * 100
+        print(f"{name:15} always redrawing {usage[False]:5.1f}% CPU, idle loop {usage[True]:5.1f}% CPU")
+        if (paused or state != "PLAYING") and usage[True] > usage[False] / 4:
+            print(f"FAIL: {name} still spins with the idle loop")
+            passed = False
+    game.idle_mode = True
+    game.paused = False
+    return passed
+
+def benchmark_ghosts(game, frames=300):
+    # Fifty minute-long runs over the current level: file size, then the cost they add to a frame
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        board = GhostBoard(1, game.current_world_index, directory)
+        for n in range(GHOST_LIMIT):
+            path = array.array("H")
+            x, y = game.spawn_platform.get_center()
+            angle = rng.uniform(0, 2 * math.pi)
+            for tick in range(60 * FPS + n):
+                angle += rng.uniform(-0.2, 0.2)
+                x = max(50, min(SCREEN_WIDTH - 50, x + 5 * math.cos(angle)))
+                y = max(50, min(SCREEN_HEIGHT - 50, y + 5 * math.sin(angle)))
+                if tick % 1200 == 1199:
+                    # A respawn: the jump forces an absolute block
+                    x, y = game.spawn_platform.get_center()
+                path.append(int(x * GHOST_SCALE))
+                path.append(int(y * GHOST_SCALE))
+            board.add(GhostRun.encode(f"runner{n}", path))
+        board.save()
+        size = os.path.getsize(board.path)
+        ticks = sum(run.ticks for run in board.runs)
+        print(f"{len(board.runs)} ghosts, {ticks} ticks in {size / 1024:.0f} KiB ({size / ticks:.2f} bytes/tick)")
+        
+        race = Race(GhostBoard(1, game.current_world_index, directory), "runner0")
+        with_ghosts = without = 0.0
+        for _ in range(frames):
+            for racing in (True, False):
+                game.race = race if racing else None
+                start = time.perf_counter()
+                game.draw_world(FrameSnapshot.capture(game))
+                elapsed = time.perf_counter() - start
+                if racing:
+                    with_ghosts += elapsed
+                else:
+                    without += elapsed
+            race.tick += 1
+        game.race = None
+    added = (with_ghosts - without) / frames * 1000
+    print(f"capture + draw: {without / frames * 1000:.2f} ms without ghosts, "
+          f"{with_ghosts / frames * 1000:.2f} ms with {len(race.ghosts(game.camera.sees))}, +{added:.2f} ms")
+    if added >= 1:
+        print("FAIL: fifty ghosts add a millisecond or more per frame")
+        return False
+    return True
+
+def benchmark_split(game, frames=200):
+    # Open-world draw cost of 1-4 viewports over one world: MAX_PLAYERS players spread far enough apart
+    # that no two views overlap, with chunks streamed around all of them, and only the first few given a view
+    random.seed(1)
+    split = Game(open_world=True, render_scale=game.render_scale, players=MAX_PLAYERS, sound=False)
+    for i, player in enumerate(split.players):
+        player.x += 3000 * (i % 2)
+        player.y += 3000 * (i // 2)
+        player.shield_active = True
+    split.follow_players()
+    split.stream_chunks()
+    keys = RecordedKeys(0)
+    for _ in range(30):
+        split.update(keys=keys)
+    # Nothing is updated from here on, so every run draws the same loaded chunks and entities
+    costs = {}
+    for count in range(1, MAX_PLAYERS + 1):
+        split.player_count = count
+        split.layout_views()
+        split.set_render_scale(split.render_scale)
+        split.follow_players()
+        capture = draw = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            views = split.capture_views()
+            captured = time.perf_counter()
+            split.render_views(views)
+            capture += captured - start
+            draw += time.perf_counter() - captured
+        costs[count] = (capture + draw) / frames * 1000
+        print(f"{count} view(s), {len(split.enemies)} enemies and {len(split.obstacles)} obstacles loaded: "
+              f"capture {capture / frames * 1000:.2f} ms, draw {draw / frames * 1000:.2f} ms, "
+              f"{costs[count] / costs[1]:.2f}x one view")
+    if costs[MAX_PLAYERS] >= MAX_PLAYERS / 2 * costs[1]:
+        print(f"FAIL: {MAX_PLAYERS} views cost half as much as {MAX_PLAYERS} separate screens or more")
+        return False
+    return True
+
+def benchmark_audio(game, calls=20000):
+    # Cost of a play() call on the frame loop, and whether stealing keeps the important voices
+    audio = game.audio
+    if not audio.enabled:
+        print("No audio device; run with SDL_AUDIODRIVER=dummy to benchmark headless")
+        return False
+    rate, _, _ = pygame.mixer.get_init()
+    print(f"mixer {rate} Hz, {AUDIO_BUFFER}-sample buffer ({AUDIO_BUFFER / rate * 1000:.1f} ms), "
+          f"{AUDIO_VOICES} voices, {len(SOUNDS)} sounds cached")
+    # Cold synthesizes every effect and this world's loop into a scratch cache, warm reads them back
+    global ASSETS
+    saved_cache = ASSETS
+    timings = []
+    with tempfile.TemporaryDirectory() as directory:
+        ASSETS = AssetCache(directory)
+        for _ in range(2):
+            SOUNDS.clear()
+            start = time.perf_counter()
+            Audio().ambient_sound(game.world_config["ambient"])
+            timings.append((time.perf_counter() - start) * 1000)
+    ASSETS = saved_cache
+    print(f"effects and ambient loop: synthesized {timings[0]:.0f} ms, from the asset cache {timings[1]:.1f} ms")
+    
+    names = list(SOUND_EFFECTS)
+    start = time.perf_counter()
+    for i in range(calls):
+        audio.play(names[i % len(names)])
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    print(f"play(): {per_call:.1f} us per call, {per_call / (1e6 / FPS) * 100:.3f}% of a frame")
+    
+    # Fill every voice with low-priority sounds, then check a high-priority one still gets through
+    for _ in range(AUDIO_VOICES):
+        audio.play("enrage")
+    busy = sum(channel.get_busy() for channel in audio.voices)
+    voice = audio.play("level_complete")
+    stolen = voice is not None and audio.priorities[voice] == SOUND_EFFECTS["level_complete"][0]
+    print(f"{busy}/{AUDIO_VOICES} voices busy: high priority {'took a voice' if stolen else 'was dropped'}")
+    pygame.mixer.stop()
+    if not stolen or per_call > 20 or timings[1] > AUDIO_MAX_LOAD_MS:
+        print(f"FAIL: play() costs over 20 us, a high-priority effect was dropped "
+              f"or cached sounds took over {AUDIO_MAX_LOAD_MS} ms to load")
+        return False
+    return True
+
+def benchmark_plugins(game, calls=20000, hooks=8):
+    # Cost of dispatching on_tick to idle plugins, and whether a slow one is throttled to its share
+    class Idle(Plugin):
+        name = "idle"
+        def on_tick(self, game, dt):
+            pass
+            
+    class Slow(Plugin):
+        name = "slow"
+        def on_tick(self, game, dt):
+            end = time.perf_counter() + 0.004
+            while time.perf_counter() < end:
+                pass
+                
+    idle = [Idle() for _ in range(hooks)]
+    plugins = Plugins()
+    for plugin in idle:
+        plugins.add(plugin)
+    def timed(dispatch):
+        start = time.perf_counter()
+        for _ in range(calls):
+            dispatch()
+        return (time.perf_counter() - start) / (calls * hooks) * 1e6
+    bound = [plugin.on_tick for plugin in idle]
+    def bare():
+        for call in bound:
+            call(game, 1)
+    def by_name():
+        # What a dispatcher looking each hook up per frame would pay
+        for plugin in idle:
+            method = getattr(plugin, "on_tick", None)
+            if method is not None:
+                method(game, 1)
+    print(f"on_tick per plugin: bound call {timed(bare):.2f} us, looked up by name {timed(by_name):.2f} us, "
+          f"registry with timing {timed(lambda: plugins.tick(game, 1)):.2f} us")
+    
+    # 4 ms per call against a 1 ms budget: flagged, then run every 4th or 8th frame
+    plugins = Plugins(budget_ms=1.0)
+    plugins.add(Slow())
+    hook = plugins.ticks[0]
+    for _ in range(100):
+        plugins.tick(game, 1)
+    start = time.perf_counter()
+    for _ in range(FPS):
+        plugins.tick(game, 1)
+    per_frame = (time.perf_counter() - start) / FPS * 1000
+    print(f"slow plugin: {hook.cost:.1f} ms per call, every {hook.interval} frames, {per_frame:.2f} ms per frame")
+    if not hook.flagged or per_frame > plugins.budget_ms * 1.25:
+        print("FAIL: a slow plugin was not throttled to its share of the frame")
+        return False
+    return True
+
+def benchmark_assets(game, frames=200):
+    # Obstacle layers baked cold, then loaded warm from a scratch cache; both must draw the same pixels
+    global ASSETS, ASSET_CACHE_VERSION
+    saved_cache = ASSETS
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        ASSETS = AssetCache(directory)
+        for world_index, world in enumerate(WORLDS):
+            random.seed(world_index)
+            game.current_world_index = world_index - 1
+            game.next_level()
+            # The first call bakes and stores the layer, the second finds it on disk
+            timings = []
+            for _ in range(2):
+                game.baked_obstacles = None
+                start = time.perf_counter()
+                game.obstacle_layer()
+                timings.append((time.perf_counter() - start) * 1000)
+            frame = FrameSnapshot.capture(game)
+            direct = frame._replace(obstacle_layer=None, obstacles=tuple(o.frame_state() for o in game.obstacles))
+            
+            costs = []
+            for drawn in (direct, frame):
+                start = time.perf_counter()
+                for _ in range(frames):
+                    game.draw_obstacles(drawn)
+                costs.append((time.perf_counter() - start) / frames * 1000)
+            game.draw_background(frame)
+            game.draw_obstacles(direct)
+            expected = frame.surface.copy()
+            game.draw_background(frame)
+            game.draw_obstacles(frame)
+            difference = image_difference(frame.surface, expected)
+            print(f"{world:12} {len(game.obstacles):3} obstacles: drawn {costs[0]:.2f} ms, layer blit {costs[1]:.3f} ms; "
+                  f"bake {timings[0]:.1f} ms, warm load {timings[1]:.1f} ms; {difference:.3%} of pixels differ")
+            if difference:
+                passed = False
+        print(f"cache: {ASSETS.hits} hits, {ASSETS.misses} misses")
+        
+        # A new drawing-code version must miss every asset baked by the old one
+        key = AssetCache.key("obstacles", game.world_config, [o.frame_state() for o in game.obstacles],
+                             game.world_surface.get_size(), game.render_scale)
+        ASSET_CACHE_VERSION += 1
+        stale = AssetCache.key("obstacles", game.world_config, [o.frame_state() for o in game.obstacles],
+                               game.world_surface.get_size(), game.render_scale)
+        os.replace(ASSETS.path(key), ASSETS.path(stale))
+        invalidated = ASSETS.load(stale) is None and not os.path.exists(ASSETS.path(stale))
+        ASSET_CACHE_VERSION -= 1
+        print(f"version bump: {'old assets rejected' if invalidated else 'OLD ASSET LOADED'}")
+        
+        # Room for two layers: storing a third evicts the least recently used one
+        lru = AssetCache(os.path.join(directory, "lru"))
+        keys = [AssetCache.key("lru", n) for n in range(3)]
+        surface = pygame.Surface((100, 100))
+        lru.store(keys[0], surface)
+        lru.max_bytes = 2 * os.path.getsize(lru.path(keys[0]))
+        lru.store(keys[1], surface)
+        # A hit on the oldest makes the other one the least recently used
+        os.utime(lru.path(keys[0]), ns=(time.time_ns() + 10 ** 9,) * 2)
+        lru.load(keys[0])
+        lru.store(keys[2], surface)
+        kept = [n for n in range(3) if os.path.exists(lru.path(keys[n]))]
+        evicted_lru = kept == [0, 2]
+        print(f"size cap of two: kept {kept} after touching 0 ({'LRU' if evicted_lru else 'NOT LRU'})")
+    ASSETS = saved_cache
+    game.baked_obstacles = None
+    if not (passed and invalidated and evicted_lru):
+        print("FAIL: baked layers differ from direct drawing, or invalidation/eviction is broken")
+        return False
+    return True
+
+def benchmark_render(game, frames=300):
+    while len(game.enemies) < 32:
+        game.spawn_additional_enemies()
+    for _ in range(60):
+        game.update()
+    initial_scale = game.render_scale
+    for scale in RENDER_SCALES:
+        game.set_render_scale(scale)
+        world = upscale = hud = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            frame = FrameSnapshot.capture(game)
+            game.draw_world(frame)
+            drawn = time.perf_counter()
+            if frame.surface is not game.screen:
+                pygame.transform.scale(frame.surface, (SCREEN_WIDTH, SCREEN_HEIGHT), game.screen)
+            scaled = time.perf_counter()
+            game.draw_hud(frame)
+            hud += time.perf_counter() - scaled
+            upscale += scaled - drawn
+            world += drawn - start
+        print(f"scale {scale:4.2f} ({game.world_surface.get_width()}x{game.world_surface.get_height()}): "
+              f"world {world / frames * 1000:.2f} ms, upscale {upscale / frames * 1000:.2f} ms, "
+              f"hud {hud / frames * 1000:.2f} ms, total {(world + upscale + hud) / frames * 1000:.2f} ms/frame")
+    game.set_render_scale(initial_scale)
+
+def benchmark_pipeline(game, frames=120, repeats=5):
+    while len(game.enemies) < 32:
+        game.spawn_additional_enemies()
+    # Keep the game in PLAYING so every tick does the full amount of work
+    game.player.shield_active = True
+    for _ in range(60):
+        game.update()
+        game.draw()
+        
+    def serial_run():
+        update_time = draw_time = 0.0
+        start = time.perf_counter()
+        for _ in range(frames):
+            tick = time.perf_counter()
+            game.update()
+            drawn = time.perf_counter()
+            game.draw()
+            update_time += drawn - tick
+            draw_time += time.perf_counter() - drawn
+        return (time.perf_counter() - start) / frames, update_time / frames, draw_time / frames
+        
+    def pipelined_run():
+        renderer = RenderThread(game)
+        renderer.start()
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.update()
+            renderer.submit(game.capture_views())
+        renderer.stop()
+        return (time.perf_counter() - start) / frames
+        
+    # Alternate the two modes so drift in machine load hits both alike
+    serial_runs = []
+    pipelined_runs = []
+    for _ in range(repeats):
+        serial_runs.append(serial_run())
+        pipelined_runs.append(pipelined_run())
+    serial, update_time, draw_time = sorted(serial_runs)[repeats // 2]
+    pipelined = sorted(pipelined_runs)[repeats // 2]
+    spread = (max(pipelined_runs) - min(pipelined_runs)) * 1000
+    
+    print(f"{os.cpu_count()} cpus, median of {repeats} runs of {frames} frames")
+    print(f"update {update_time * 1000:.2f} ms, draw {draw_time * 1000:.2f} ms")
+    print(f"serial {serial * 1000:.2f} ms/frame, pipelined {pipelined * 1000:.2f} ms/frame "
+          f"(best possible {max(update_time, draw_time) * 1000:.2f}, run-to-run spread {spread:.2f} ms)")
+    if serial - pipelined <= spread:
+        print("no overlap beyond run-to-run noise")
+    else:
+        print(f"pipelining saves {(serial - pipelined) * 1000:.2f} ms/frame")
+    
+    # Does pygame drop the GIL in fill/blit? Run them beside pure Python work.
+    target = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    source = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    def blit_work():
+        for _ in range(100):
+            target.fill(BLACK)
+            target.blit(source, (0, 0))
+    def python_work():
+        for _ in range(100):
+            sum(i * i for i in range(2000))
+    def concurrent_work():
+        worker = threading.Thread(target=blit_work)
+        worker.start()
+        python_work()
+        worker.join()
+    def timed(work):
+        start = time.perf_counter()
+        work()
+        return time.perf_counter() - start
+        
+    blit_work()
+    python_work()
+    samples = [(timed(blit_work), timed(python_work), timed(concurrent_work)) for _ in range(repeats)]
+    blit_time, python_time, together = (sorted(column)[repeats // 2] for column in zip(*samples))
+    print(f"fill+blit {blit_time * 1000:.1f} ms, python {python_time * 1000:.1f} ms, "
+          f"both on two threads {together * 1000:.1f} ms (sum {(blit_time + python_time) * 1000:.1f} ms, "
+          f"fully parallel would be {max(blit_time, python_time) * 1000:.1f} ms)")
+
+BENCHMARKS = {
+    "ai": benchmark_ai,
+    "assets": benchmark_assets,
+    "audio": benchmark_audio,
+    "collision": benchmark_collision,
+    "crowd": benchmark_crowd,
+    "ghosts": benchmark_ghosts,
+    "idle": benchmark_idle,
+    "pipeline": benchmark_pipeline,
+    "plugins": benchmark_plugins,
+    "render": benchmark_render,
+    "snapshot": benchmark_snapshots,
+    "split": benchmark_split,
+    "timestep": benchmark_timestep,
+    "trajectory": benchmark_trajectory,
+    "vision": benchmark_vision,
+}
+
 # Main execution
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ball Escape Adventure")
+    parser.add_argument("--bench", choices=sorted(BENCHMARKS), help="run a benchmark and exit")
+    parser.add_argument("--open-world", action="store_true", help="play in a large scrolling arena")
+    parser.add_argument("--render-scale", type=float, choices=RENDER_SCALES, default=1.0,
+                        help="draw the world at a fraction of the window resolution")
+    parser.add_argument("--players", type=int, choices=range(1, MAX_PLAYERS + 1), default=1,
+                        help="local players: WASD, arrow keys, then gamepads")
+    parser.add_argument("--mute", action="store_true", help="play without sound")
+    parser.add_argument("--plugins", action="append", metavar="PATH",
+                        help="load plugins from a .py file or a directory of them (repeatable)")
+    parser.add_argument("--pipelined", action="store_true", help="draw on a separate thread from the simulation")
+    parser.add_argument("--record", metavar="FILE", help="record this run so it can be exported later")
+    parser.add_argument("--export", nargs=2, metavar=("RECORDING", "OUTPUT"),
+                        help="render a recording to a video file (needs ffmpeg) or a PNG directory")
+    parser.add_argument("--workers", type=int, help="processes used by --export (default: all cores)")
+    parser.add_argument("--race", nargs=2, metavar=("WORLD", "SEED"),
+                        help="race the ghosts of earlier runs through a seeded level of WORLD")
+    parser.add_argument("--trajectory", metavar="DIR",
+                        help="write per-tick observations to DIR for analysis (read with read_trajectory)")
+    parser.add_argument("--hot-reload", action="store_true",
+                        help="apply edits to the world files while playing (development)")
+    parser.add_argument("--golden", nargs="?", const="check", choices=("check", "update"),
+                        help="compare each world's seeded scene with its golden image and time the draw layers")
+    parser.add_argument("--check-worlds", action="store_true",
+                        help="parse and validate every world file, then exit")
+    parser.add_argument("--stress", nargs="?", const="stress_report.json", metavar="REPORT",
+                        help="find the largest entity counts that stay within the frame budget")
+    args = parser.parse_args()
+    if args.plugins and (args.record or args.export or args.race or args.golden):
+        parser.error("--record, --export, --race and --golden replay the stock game without --plugins")
+    # Before any world is loaded, since worlds may use the plugins' background elements
+    for path in args.plugins or ():
+        try:
+            load_plugins(path)
+        except Exception as e:
+            sys.exit(f"Could not load plugins from {path}: {e}")
+    if args.check_worlds:
+        try:
+            WORLDS.validate()
+        except WorldError as e:
+            sys.exit(f"Invalid world definition: {e}")
+        print(f"All {len(WORLDS)} worlds are valid")
+        sys.exit()
+    if args.record and args.open_world:
+        parser.error("--record is not supported in open-world mode")
+    if args.stress and args.open_world:
+        parser.error("--stress runs on the fixed-size worlds, not open-world mode")
+    if args.players > 1 and (args.record or args.race or args.trajectory or args.stress or args.golden):
+        parser.error("--record, --race, --trajectory, --stress and --golden follow a single player")
+    if args.golden and args.open_world:
+        parser.error("--golden draws the fixed-size worlds, not open-world mode")
+    if args.golden:
+        # Set before the game loads its fonts
+        FONT_NAME = None
+    if args.race:
+        if args.open_world or args.record:
+            parser.error("--race cannot be combined with --open-world or --record")
+        if args.race[0] not in WORLDS or not args.race[1].isdigit():
+            parser.error(f"--race takes one of {', '.join(WORLDS.keys())} and a numeric seed")
+    
+    if args.export:
+        export_replay(*args.export, workers=args.workers, render_scale=args.render_scale)
+        sys.exit()
+        
+    # Worlds are loaded as play reaches them, so a broken file is reported then
+    try:
+        game = Game(open_world=args.open_world, render_scale=args.render_scale, players=args.players,
+                    sound=not args.mute)
+        if args.record:
+            game.start_recording(args.record)
+        if args.race:
+            game.start_race(game.worlds_list.index(args.race[0]), int(args.race[1]))
+        if args.trajectory:
+            game.start_trajectory(args.trajectory)
+        if args.stress:
+            run_stress(game, args.stress)
+            pygame.quit()
+            sys.exit()
+        if args.golden:
+            passed = run_golden(game, update=args.golden == "update")
+            pygame.quit()
+            sys.exit(0 if passed else 1)
+        if args.bench:
+            # Benchmarks with pass/fail checks return False when one fails
+            passed = BENCHMARKS[args.bench](game) is not False
+            pygame.quit()
+            sys.exit(0 if passed else 1)
+        game.run(pipelined=args.pipelined, hot_reload=args.hot_reload)
+    except WorldError as e:
+        pygame.quit()
+        sys.exit(f"Invalid world definition: {e}")
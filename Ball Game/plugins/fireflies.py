@@ -0,0 +1,36 @@
+# Example plugin: python game.py --plugins plugins
+# Adds a "firefly" background element, which a world can also list in its bg_elements,
+# and scatters a few of them over every fixed-size level.
+import math
+import random
+
+FIREFLIES_PER_LEVEL = 8
+
+def register(game):
+    def wander(element, dt):
+        element.angle += random.uniform(-10, 10) * dt
+        element.x += math.cos(math.radians(element.angle)) * element.speed * dt
+        element.y += math.sin(math.radians(element.angle)) * element.speed * dt
+        area = element.area
+        element.x = min(max(element.x, area.left), area.right)
+        element.y = min(max(element.y, area.top), area.bottom)
+
+    def draw(screen, camera, x, y, size, angle):
+        glow = 3 + size % 3
+        game.pygame.draw.circle(screen, (90, 90, 20), (x, y), camera.size(glow + 3))
+        game.pygame.draw.circle(screen, game.YELLOW, (x, y), camera.size(glow))
+
+    class Fireflies(game.Plugin):
+        name = "fireflies"
+
+        def on_level_load(self, game_state):
+            # Open-world chunks rebuild the element list as they stream, so only fixed levels get extras
+            if game_state.open_world:
+                return
+            for _ in range(FIREFLIES_PER_LEVEL):
+                x = random.randint(0, game.SCREEN_WIDTH)
+                y = random.randint(0, game.SCREEN_HEIGHT)
+                game_state.background_elements.append(game.BackgroundElement(x, y, "firefly"))
+
+    game.register_bg_element("firefly", draw, wander, count=5)
+    game.register_plugin(Fireflies())